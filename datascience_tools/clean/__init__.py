@@ -1,5 +1,19 @@
 from .clean import clean_files
+from .clean import clean_file
+from .clean import requires_full_file
+from .clean import normalize_text_columns
+from .clean import CleaningJob
+from .clean import CLEANING_JOBS
+from .clean import run_cleaning_jobs
+from .clean import load_cleaned_frame
 
 __all__ = [
     'clean_files',
+    'clean_file',
+    'requires_full_file',
+    'normalize_text_columns',
+    'CleaningJob',
+    'CLEANING_JOBS',
+    'run_cleaning_jobs',
+    'load_cleaned_frame',
     ]
@@ -1,7 +1,17 @@
 import pandas as pd
+import multiprocessing
+import os
 import time
+import traceback
 import re
-from util import upload_to_s3
+from collections import namedtuple
+from functools import partial
+from ..etl.util import upload_to_s3
+from ..etl.util import convert_dates_to_reporting_year
+from ..etl.cache import FrameCache
+from ..etl.cache import code_digest
+from ..etl.cache import file_digest
+from ..etl.dtypes import optimize_dtypes
 
 # For naming cleaned files
 TIME = time.localtime()
@@ -18,7 +28,7 @@ CLEAN_FILEPATH = '<<PATH>>'
 BUCKET_NAME = '<<NAME>>'
 S3_CLEANED_DATA_DIR = '<<CLEANED>>'
 
-def clean_cabarrus_suspension(susp_df):
+def clean_cabarrus_suspension(susp_df, cutover_month=7, copy=True):
     """
     Returns
     ---------
@@ -28,29 +38,19 @@ def clean_cabarrus_suspension(susp_df):
     ----------
     susp_df : pd.DataFrame
 	suspension dataframe
+    cutover_month : int
+	last month of the school year; incidents after it count towards the next reporting year
+    copy : bool
+	if False, modifies susp_df in place instead of working on a deep copy
     """
 
-    def convert_to_reporting_year(date_string):
-	"""
-	Helper function to convert suspension column to Reporting Year format
-	"""
-
-	if pd.isnull(date_string): # do nothing if null
-	    return date_string
-	else:
-	    converted_date = datetime.datetime.strptime(date_string, '%m/%d/%Y')
-	    if converted_date.month <= 7: # if it happened during second semester
-		return converted_date.year # reporting year happens at the end of a school year
-	    else: # if it happened during first semester
-		return converted_date.year + 1
-
-    cleaned_susp_df = susp_df.copy(deep=True)
-    # Warning: the below takes a few minutes to run
-    cleaned_susp_df['Converted Reporting Year'] = cleaned_susp_df['Incident Date'].apply(convert_to_reporting_year)
+    cleaned_susp_df = susp_df.copy(deep=True) if copy else susp_df
+    cleaned_susp_df['Converted Reporting Year'] = convert_dates_to_reporting_year(
+        cleaned_susp_df['Incident Date'], cutover_month=cutover_month)
 
     return cleaned_susp_df
 
-def clean_cabarrus_post_sec(post_sec_df):
+def clean_cabarrus_post_sec(post_sec_df, copy=True):
   """
   Returns
   ----------
@@ -61,10 +61,12 @@ def clean_cabarrus_post_sec(post_sec_df):
   ----------
   post_sec_df : pd.DataFrame
       dataframe of Cabarrus Clearinghouse data
+  copy : bool
+      if False, modifies post_sec_df in place instead of working on a deep copy
   """
   # Start writing cleaning routines below
   # ----------
-  cleaned_post_sec_df = post_sec_df.copy(deep=True)
+  cleaned_post_sec_df = post_sec_df.copy(deep=True) if copy else post_sec_df
 
   ## Removing '_' from the end of each value in 'YOUR_UNIQUE_IDENTIFIER'
   ## Note: Since Brian reuploaded this data on 10-1-2014 with External_Student_ID, this is no longer necessary
@@ -82,7 +84,41 @@ def clean_cabarrus_post_sec(post_sec_df):
   return cleaned_post_sec_df
 
 
-def clean_cabarrus_dropout(dropout_df):
+def normalize_text_columns(df, cols, encoding='latin-1', to_remove=u' \xa0', categorical=True):
+    """
+    Returns
+    ----------
+    df with each of cols decoded, stripped of to_remove and (optionally)
+    converted to a categorical. Modifies df in place.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    cols : list
+        text columns to normalize
+    encoding : str
+        encoding of the raw bytes. Pass None if the file was already decoded
+        at read time, e.g. read with pd.read_table(..., encoding='latin-1')
+    to_remove : unicode
+        substring to strip out of every value
+    categorical : bool
+        convert the cleaned columns to categoricals. Use for low-cardinality
+        columns like gender or ethnicity.
+    """
+    for col in cols:
+        if df[col].dtype != object:  # e.g. a chunk where Age parsed as ints
+            if categorical:
+                df[col] = df[col].astype('category')
+            continue
+        values = df[col].str
+        if encoding is not None:
+            values = values.decode(encoding).str
+        values = values.replace(to_remove, '')
+        df[col] = values.astype('category') if categorical else values
+    return df
+
+
+def clean_cabarrus_dropout(dropout_df, copy=True, encoding='latin-1'):
     """
     Returns
     ----------
@@ -92,62 +128,276 @@ def clean_cabarrus_dropout(dropout_df):
     ----------
     dropout_df : pd.DataFrame
         dataframe of Cabarrus dropout dataframe
+    copy : bool
+        if False, modifies dropout_df in place instead of working on a deep copy
+    encoding : str
+        encoding of the text columns, or None if they were decoded at read time
     """
     # Starting writing cleaning routines below
     # ----------
 
     ## Removing funky the character from columns
-    clean_dropout_df = dropout_df.copy(deep=True)
-    clean_dropout_df['Gender'] = clean_dropout_df['Gender'].apply(lambda s: s.decode('latin-1').replace(u' \xa0', ''))
-    clean_dropout_df['Age'] = clean_dropout_df['Age'].apply(lambda s: s.decode('latin-1').replace(u' \xa0', ''))
-    clean_dropout_df['DO_year'] = clean_dropout_df['DO_year'].apply(lambda s: s.decode('latin-1').replace(u' \xa0', ''))
-    clean_dropout_df['Ethnicity'] = clean_dropout_df['Ethnicity'].apply(lambda s: s.decode('latin-1').replace(u' \xa0', ''))
+    clean_dropout_df = dropout_df.copy(deep=True) if copy else dropout_df
+    normalize_text_columns(clean_dropout_df, ['Gender', 'Age', 'DO_year', 'Ethnicity'],
+                           encoding=encoding)
     # ---------
     # End cleaning routines
 
     return clean_dropout_df
 
 
-def clean_files(raw_filepath, clean_filepath):
-  """
-  Runs all the clean routines
+def requires_full_file(cleaning_routine):
+    """
+    Decorator for cleaning routines that need to see the whole file at once
+    (e.g. deduplicating or ranking across rows). clean_file will not stream
+    a file in chunks if any of its routines is marked with this.
+    """
+    cleaning_routine.requires_full_file = True
+    return cleaning_routine
+
+
+def _requires_full_file(cleaning_routine):
+    # functools.partial hides the attributes of the wrapped function
+    routine = getattr(cleaning_routine, 'func', cleaning_routine)
+    return getattr(routine, 'requires_full_file', False)
+
+
+def clean_file(raw_path, clean_path, cleaning_routines, read_func=pd.read_csv,
+               chunksize=None, **read_kwargs):
+    """
+    Returns
+    ----------
+    Number of rows written. Reads raw_path, runs each cleaning routine on it
+    in order and writes the result to clean_path as a csv.
+
+    Parameters
+    ----------
+    raw_path : str
+        path of the raw file
+    clean_path : str
+        path to write the cleaned file to
+    cleaning_routines : list
+        functions that take and return a pd.DataFrame
+    read_func : function
+        pd.read_csv, pd.read_table, ...
+    chunksize : int
+        if given, the file is read, cleaned and appended to clean_path this many
+        rows at a time so peak memory stays bounded. Ignored if any routine
+        requires_full_file.
+    """
+    if chunksize is None or any(_requires_full_file(r) for r in cleaning_routines):
+        chunks = [read_func(raw_path, **read_kwargs)]
+    else:
+        chunks = read_func(raw_path, chunksize=chunksize, **read_kwargs)
+
+    n_rows = 0
+    for i, chunk in enumerate(chunks):
+        for cleaning_routine in cleaning_routines:
+            chunk = cleaning_routine(chunk)
+        chunk.to_csv(clean_path, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        n_rows += chunk.shape[0]
+    return n_rows
+
+
+CleaningJob = namedtuple('CleaningJob', ['name', 'raw_filename', 'clean_filename',
+                                         'read_func', 'cleaning_routines'])
+
+
+def _clean_filename(raw_filename):
+    name, ext = os.path.splitext(raw_filename)
+    return name + CLEAN_SUFFIX + ext
+
+
+# Register new datasets here. Jobs run independently of each other.
+CLEANING_JOBS = [
+    CleaningJob(name='Cabarrus post-secondary',
+                raw_filename='Cabarrus Grade results Clearing house-DETAIL 2008-2013 grads ExternalID.csv',
+                clean_filename=_clean_filename('Cabarrus Grade results Clearing house-DETAIL 2008-2013 grads ExternalID.csv'),
+                read_func=pd.read_csv,
+                cleaning_routines=[partial(clean_cabarrus_post_sec, copy=False)]),
+    CleaningJob(name='Cabarrus dropout',
+                raw_filename='Dropout_Data_0708_1213_20141001.txt',
+                clean_filename=_clean_filename('Dropout_Data_0708_1213_20141001.txt'),
+                read_func=partial(pd.read_table, encoding='latin-1'),  # decode once at read time
+                cleaning_routines=[partial(clean_cabarrus_dropout, copy=False, encoding=None)]),
+    CleaningJob(name='Cabarrus suspension',
+                raw_filename='Student_Suspension_Data_20141001.txt',
+                clean_filename=_clean_filename('Student_Suspension_Data_20141001.txt'),
+                read_func=pd.read_table,
+                cleaning_routines=[partial(clean_cabarrus_suspension, copy=False)]),
+]
+
+
+def _read_and_clean(job, raw_path):
+    df = job.read_func(raw_path)
+    for cleaning_routine in job.cleaning_routines:
+        df = cleaning_routine(df)
+    return df
+
+
+def _job_cache_key(job, raw_path, cache):
+    return cache.key(job.name, file_digest(raw_path),
+                     code_digest(job.read_func, *job.cleaning_routines))
+
+
+def load_cleaned_frame(job, raw_filepath, cache_dir, fmt='parquet', optimize=True):
+    """
+    Returns
+    ----------
+    The cleaned dataframe for job. It is loaded from cache_dir if the raw file
+    and the cleaning code are unchanged since it was cached, and is otherwise
+    cleaned from scratch and cached.
+
+    Parameters
+    ----------
+    job : CleaningJob
+    raw_filepath : str
+        folder holding the raw files
+    cache_dir : str
+        folder holding cached cleaned frames
+    fmt : str
+        'parquet' or 'feather'
+    optimize : bool
+        return the frame in compact dtypes (see etl.dtypes.optimize_dtypes) and
+        print the memory saved. The cache holds the frame as cleaned.
+    """
+    cache = FrameCache(cache_dir, fmt)
+    raw_path = os.path.join(raw_filepath, job.raw_filename)
+    cleaned = cache.get_or_compute(_job_cache_key(job, raw_path, cache),
+                                   partial(_read_and_clean, job, raw_path))
+    if optimize:
+        cleaned = optimize_dtypes(cleaned)
+    return cleaned
+
+
+def run_cleaning_job(job, raw_filepath, clean_filepath, chunksize=None, upload=True,
+                     cache_dir=None):
+    """
+    Returns
+    ----------
+    (job name, seconds elapsed, error) where error is None or the formatted
+    traceback of whatever the job raised.
+
+    Parameters
+    ----------
+    job : CleaningJob
+    raw_filepath : str
+        folder holding the raw files
+    clean_filepath : str
+        folder to write the cleaned files to
+    chunksize : int
+        passed on to clean_file
+    upload : bool
+        whether to upload the cleaned file to S3
+    cache_dir : str
+        if given, cleaned frames are cached here (see load_cleaned_frame) and
+        files whose input and cleaning code haven't changed are not re-cleaned.
+        Streamed (chunksize) jobs are not cached.
+    """
+    start_time = time.time()
+    raw_path = os.path.join(raw_filepath, job.raw_filename)
+    clean_path = os.path.join(clean_filepath, job.clean_filename)
+    try:
+        if cache_dir is not None and chunksize is None:
+            cache = FrameCache(cache_dir)
+            key = _job_cache_key(job, raw_path, cache)
+            if key not in cache or not os.path.exists(clean_path):
+                cleaned_df = cache.get_or_compute(key, partial(_read_and_clean, job, raw_path))
+                cleaned_df.to_csv(clean_path, index=False)
+        else:
+            clean_file(raw_path, clean_path, job.cleaning_routines, read_func=job.read_func,
+                       chunksize=chunksize)
+        if upload:
+            upload_to_s3(clean_filepath, job.clean_filename, BUCKET_NAME, S3_CLEANED_DATA_DIR)
+        error = None
+    except Exception:
+        # tracebacks don't pickle, so send back the text
+        error = traceback.format_exc()
+    return job.name, time.time() - start_time, error
+
+
+def _run_cleaning_job_star(args):
+    return run_cleaning_job(*args)
+
+
+def run_cleaning_jobs(jobs, raw_filepath, clean_filepath, processes=None, chunksize=None,
+                      upload=True, cache_dir=None):
+    """
+    Returns
+    ----------
+    (timings, errors) : dicts keyed by job name. timings holds the seconds each
+    job took; errors holds the traceback of every job that failed. A failing
+    job does not stop the others.
+
+    Parameters
+    ----------
+    jobs : list of CleaningJob
+    raw_filepath : str
+    clean_filepath : str
+    processes : int
+        size of the process pool. Defaults to one process per job (capped at
+        the number of cpus); 1 runs the jobs serially in this process.
+    chunksize : int
+        passed on to clean_file
+    upload : bool
+        whether to upload cleaned files to S3
+    cache_dir : str
+        folder to cache cleaned frames in, see run_cleaning_job
+    """
+    args = [(job, raw_filepath, clean_filepath, chunksize, upload, cache_dir) for job in jobs]
+    if processes is None:
+        processes = min(len(jobs), multiprocessing.cpu_count())
+
+    if processes <= 1:
+        results = map(_run_cleaning_job_star, args)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = list(pool.imap_unordered(_run_cleaning_job_star, args))
+        finally:
+            pool.close()
+            pool.join()
+
+    timings, errors = {}, {}
+    for name, elapsed, error in results:
+        timings[name] = elapsed
+        status = 'failed' if error else 'finished'
+        print '{} {} in {:.1f} seconds'.format(name, status, elapsed)
+        if error:
+            errors[name] = error
+    return timings, errors
+
+
+def clean_files(raw_filepath, clean_filepath, chunksize=None, processes=None, cache_dir=None):
   """
+  Runs all the clean routines in CLEANING_JOBS, in parallel. Returns a dict
+  of job name -> traceback for any job that failed.
 
-  # Cleans Cabarrus post-secondary data
-  print 'Starting Cabarrus post-secondary data cleaning...'
-  post_sec_raw_filename = 'Cabarrus Grade results Clearing house-DETAIL 2008-2013 grads ExternalID'
-  post_sec_clean_filename = post_sec_raw_filename + CLEAN_SUFFIX
-  post_sec_raw_df = pd.read_csv(raw_filepath + post_sec_raw_filename + '.csv')
-  cleaned_post_sec_df = clean_cabarrus_post_sec(post_sec_raw_df)
-  cleaned_post_sec_df.to_csv(clean_filepath + post_sec_clean_filename + '.csv',
-                             index=False)
-  upload_to_s3(clean_filepath, post_sec_clean_filename + '.csv', BUCKET_NAME, S3_CLEANED_DATA_DIR)
-  print 'Finished cleaning and saved to {}'.format(clean_filepath + post_sec_clean_filename + '.csv')
-
-  # Cleans Cabarrus dropout data
-  print 'Starting Cabarrus dropout data cleaning...'
-  dropout_raw_filename = 'Dropout_Data_0708_1213_20141001'
-  dropout_clean_filename = dropout_raw_filename + CLEAN_SUFFIX
-  dropout_raw_df = pd.read_table(raw_filepath + dropout_raw_filename + '.txt')
-  cleaned_dropout_df = clean_cabarrus_dropout(dropout_raw_df)
-  cleaned_dropout_df.to_csv(clean_filepath + dropout_clean_filename + '.txt',
-		  	    index=False)
-  upload_to_s3(clean_filepath, dropout_clean_clean_filename + '.txt', BUCKET_NAME, S3_CLEANED_DATA_DIR)
-  print 'Finished cleaning and saved to {}'.format(clean_filepath + dropout_clean_filename + '.txt')
-
-  # Cleans Cabarrus suspension data
-  print 'Starting Cabarrus suspension data cleaning...'
-  suspension_raw_filename = 'Student_Suspension_Data_20141001'
-  suspension_clean_filename = suspension_raw_filename + CLEAN_SUFFIX
-  suspension_raw_df = pd.read_table(raw_filepath + suspension_raw_filename + 'txt')
-  cleaned_suspension_df = clean_cabarrus_suspension(suspension_raw_df)
-  df_to_s3(cleaned_suspension_df, clean_filepath, suspension_clean_filename, BUCKET_NAME, S3_CLEANED_DATA_DIR)
-  return None
+  Parameters
+  ----------
+  raw_filepath : str
+      folder holding the raw files
+  clean_filepath : str
+      folder to write the cleaned files to
+  chunksize : int
+      if given, streams each file through its cleaning routines this many rows at a time
+  processes : int
+      number of files to clean at once; defaults to all of them
+  cache_dir : str
+      if given, files whose raw input and cleaning code are unchanged are loaded
+      from this cache instead of being cleaned again
+  """
+  timings, errors = run_cleaning_jobs(CLEANING_JOBS, raw_filepath, clean_filepath,
+                                      processes=processes, chunksize=chunksize,
+                                      cache_dir=cache_dir)
+  return errors
 
 
 if __name__ == '__main__':
   print 'Starting cleaning...'
   start_time = time.time()
-  clean_files(RAW_FILEPATH, CLEAN_FILEPATH)
+  errors = clean_files(RAW_FILEPATH, CLEAN_FILEPATH)
+  for name, error in errors.items():
+    print '{} failed:\n{}'.format(name, error)
   end_time = time.time()
   print 'Cleaning ended. {} seconds have elapsed'.format(end_time - start_time)
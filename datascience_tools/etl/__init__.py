@@ -1,7 +1,25 @@
 from .util import upload_to_s3
 from .util import make_rename_col_dict
+from .util import grade_renamer
+from .util import convert_dates_to_reporting_year
+from .util import pivot_years
+from .util import join_years
+from .dtypes import optimize_dtypes
+from .cache import FrameCache
+from .incremental import IncrementalCohort
+from .s3 import S3Uploader
+from .s3 import get_uploader
 
 __all__ = [
     'upload_to_s3',
     'make_rename_col_dict',
+    'grade_renamer',
+    'convert_dates_to_reporting_year',
+    'pivot_years',
+    'join_years',
+    'optimize_dtypes',
+    'FrameCache',
+    'IncrementalCohort',
+    'S3Uploader',
+    'get_uploader',
 ]
@@ -0,0 +1,183 @@
+import hashlib
+import inspect
+import os
+import re
+import sys
+import pandas as pd
+
+# Bump this to invalidate every cached frame, e.g. after changing how frames are stored
+CACHE_VERSION = '2'
+
+# Code from this package is hashed by the source of its whole module, and of
+# the package modules that module uses (see code_digest)
+_PACKAGE = __name__.split('.')[0]
+
+# feather can't store an index, so its levels are stored as columns named like this
+_INDEX_COLUMN = re.compile(r'^__index_(\d+)__(.*)$')
+
+
+def file_digest(path, blocksize=2**20):
+    """
+    Returns the sha1 hex digest of a file's contents, read blocksize bytes at a time.
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def frame_digest(df):
+    """
+    Returns a sha1 hex digest of a dataframe's columns, index and values.
+    """
+    sha = hashlib.sha1()
+    sha.update(repr(list(df.columns)).encode('utf-8'))
+    sha.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return sha.hexdigest()
+
+
+def _package_modules(module):
+    """
+    Returns module and, transitively, every module of this package it takes
+    functions, classes or modules from, sorted by name.
+    """
+    seen = {}
+    todo = [module]
+    while todo:
+        mod = todo.pop()
+        if mod.__name__ in seen:
+            continue
+        seen[mod.__name__] = mod
+        for value in vars(mod).values():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if (isinstance(name, str) and name.split('.')[0] == _PACKAGE
+                    and name not in seen and name in sys.modules):
+                todo.append(sys.modules[name])
+    return [seen[name] for name in sorted(seen)]
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (IOError, TypeError):  # builtins, C extensions
+        return '{}.{}'.format(getattr(obj, '__module__', ''), getattr(obj, '__name__', repr(obj)))
+
+
+def code_digest(*funcs):
+    """
+    Returns a sha1 hex digest of the source code of funcs, so cached outputs
+    are invalidated when the code that produced them changes. Arguments bound
+    with functools.partial are included.
+
+    For functions from this package, the whole source of their module and of
+    the package modules it uses is hashed. So editing a helper they call,
+    e.g. convert_dates_to_reporting_year for clean_cabarrus_suspension, also
+    invalidates the cache. Other functions are hashed by their own source.
+    """
+    sha = hashlib.sha1()
+    for func in funcs:
+        if hasattr(func, 'func'):  # functools.partial
+            sha.update(repr((func.args, sorted(func.keywords.items()))).encode('utf-8'))
+            func = func.func
+        module_name = getattr(func, '__module__', None)
+        if isinstance(module_name, str) and module_name.split('.')[0] == _PACKAGE:
+            sha.update(module_name.encode('utf-8'))
+            for module in _package_modules(sys.modules[module_name]):
+                sha.update(_source(module).encode('utf-8'))
+        else:
+            sha.update(_source(func).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _has_default_index(df):
+    return (isinstance(df.index, pd.RangeIndex) and df.index.name is None
+            and df.index.equals(pd.RangeIndex(len(df))))
+
+
+def _index_to_columns(df):
+    """
+    Returns df with its index levels as leading columns named after
+    _INDEX_COLUMN, and a default index, for feather.
+    """
+    if _has_default_index(df):
+        return df
+    names = ['__index_{}__{}'.format(i, '' if name is None else name)
+             for i, name in enumerate(df.index.names)]
+    flat = df.copy(deep=False)
+    flat.index = flat.index.set_names(names)
+    return flat.reset_index()
+
+
+def _columns_to_index(df):
+    matches = [_INDEX_COLUMN.match(col) if hasattr(col, 'startswith') else None for col in df.columns]
+    index_cols = [col for col, match in zip(df.columns, matches) if match]
+    if not index_cols:
+        return df
+    restored = df.set_index(index_cols)
+    restored.index = restored.index.set_names(
+        [match.group(2) or None for match in matches if match])
+    return restored
+
+
+class FrameCache(object):
+    """
+    Content-addressed store of dataframes in a columnar binary format.
+
+    Build a key from whatever determines the frame (input file digests, code
+    digests, parameters) and use get_or_compute to only do the work when
+    nothing is stored under that key yet.
+
+    Parameters
+    ----------
+    cache_dir : str
+        folder the frames are written to
+    fmt : str
+        'parquet' or 'feather'. Both need pyarrow installed. Both keep the
+        frame's index; feather stores it as columns.
+    """
+
+    def __init__(self, cache_dir, fmt='parquet'):
+        if fmt not in ('parquet', 'feather'):
+            raise ValueError("fmt must be 'parquet' or 'feather', not {}".format(fmt))
+        self.cache_dir = cache_dir
+        self.fmt = fmt
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, *parts):
+        sha = hashlib.sha1(CACHE_VERSION.encode('utf-8'))
+        for part in parts:
+            sha.update(repr(part).encode('utf-8'))
+        return sha.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.' + self.fmt)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        if self.fmt == 'parquet':
+            return pd.read_parquet(self.path(key))
+        return _columns_to_index(pd.read_feather(self.path(key)))
+
+    def save(self, key, df):
+        # write to a temp file first so readers never see a half-written frame
+        tmp_path = '{}.{}.tmp'.format(self.path(key), os.getpid())
+        if self.fmt == 'parquet':
+            df.to_parquet(tmp_path)
+        else:
+            _index_to_columns(df).to_feather(tmp_path)
+        os.rename(tmp_path, self.path(key))
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the frame stored under key, or calls compute(), stores and
+        returns its result.
+        """
+        if key in self:
+            return self.load(key)
+        df = compute()
+        self.save(key, df)
+        return df
@@ -0,0 +1,114 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Low-cardinality demographic columns, stored as categoricals whatever their
+# year suffix ('sex', 'sex_2010', 'sex_9th_grade', ...)
+CATEGORICAL_COLUMNS = ['ethnic', 'sex', 'swd', 'eds', 'lep']
+
+_YEAR_SUFFIX = re.compile(r'_(\d{4}|\d+th_grade)$')
+
+# float32 holds every integer up to 2**24 exactly; larger ones (e.g. ids) stay float64
+_FLOAT32_EXACT = 2 ** 24
+
+# nullable integer columns need pandas >= 0.24
+_HAS_NULLABLE_INT = hasattr(pd, 'Int8Dtype')
+
+
+def base_column_name(col):
+    """
+    Returns col without its '_<year>' or '_<grade>th_grade' suffix.
+    """
+    try:
+        return _YEAR_SUFFIX.sub('', col)
+    except TypeError:  # not a string column name
+        return col
+
+
+def _compact_float(s, nullable_flags, float32):
+    values = s.values
+    observed = values[~np.isnan(values)]
+    if len(observed) == 0:
+        return s.astype(np.float32) if float32 else s
+    integral = np.array_equal(observed, np.floor(observed))
+    if integral and len(observed) == len(values):
+        return pd.to_numeric(s.astype(np.int64), downcast='integer')
+    if integral and nullable_flags and _HAS_NULLABLE_INT and np.isin(observed, [0, 1]).all():
+        return s.astype('Int8')  # 0/1 flag with missing values
+    if not float32 or (integral and np.abs(observed).max() >= _FLOAT32_EXACT):
+        return s
+    return s.astype(np.float32)
+
+
+def _compact_column(s, categorical, max_category_fraction, nullable_flags, float32):
+    if categorical:
+        return s.astype('category')
+    dtype = s.dtype
+    if dtype == np.bool_ or not isinstance(dtype, np.dtype):  # bool, category and other extension types
+        return s
+    if np.issubdtype(dtype, np.floating):
+        return _compact_float(s, nullable_flags, float32)
+    if np.issubdtype(dtype, np.integer):
+        return pd.to_numeric(s, downcast='integer')
+    if dtype == object and len(s) > 0:
+        try:
+            n_unique = s.nunique()
+        except TypeError:  # unhashable cells, e.g. lists
+            return s
+        if n_unique <= max_category_fraction * len(s):
+            return s.astype('category')
+    return s
+
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / float(2 ** 20)
+
+
+def optimize_dtypes(df, categorical_columns=CATEGORICAL_COLUMNS, max_category_fraction=0.5,
+                    nullable_flags=True, float32=False, verbose=True):
+    """
+    Returns a copy of df with every column stored in the most compact dtype
+    that keeps its values:
+    - columns named in categorical_columns (with any year suffix) become categoricals
+    - other string columns become categoricals if they have few distinct values
+    - whole-number floats without missing values and integers are downcast to
+      the smallest integer type; 0/1 flags with missing values become
+      nullable Int8
+    - other floats stay float64. With float32=True they become float32,
+      unless they hold whole numbers too large for float32 to represent exactly.
+
+    join_years, IncrementalCohort.build and load_cleaned_frame run this by
+    default. The modeling Imputer and the exploration profiler take the
+    categorical and Int8 columns it produces. Nullable Int8 columns can only
+    be written to parquet or feather with pandas >= 1.0; pass
+    nullable_flags=False to keep such flags as floats.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    categorical_columns : list
+        base names of the columns that are always categorical
+    max_category_fraction : float
+        string columns with at most this fraction of distinct values become categoricals
+    nullable_flags : bool
+    float32 : bool
+        trade float precision for half the memory
+    verbose : bool
+        prints the memory used before and after
+    """
+    categorical_columns = set(categorical_columns)
+    columns = [_compact_column(df.iloc[:, i],
+                               base_column_name(col) in categorical_columns,
+                               max_category_fraction, nullable_flags, float32)
+               for i, col in enumerate(df.columns)]
+    if columns:
+        optimized = pd.concat(columns, axis=1)
+        optimized.columns = df.columns
+    else:
+        optimized = df.copy()
+
+    if verbose:
+        before, after = frame_memory_mb(df), frame_memory_mb(optimized)
+        print 'Memory: {:.1f} MB -> {:.1f} MB ({:.0%} smaller)'.format(
+            before, after, 1 - after / before if before else 0)
+    return optimized
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from .cache import CACHE_VERSION
+from .cache import FrameCache
+from .cache import code_digest
+from .cache import frame_digest
+from .dtypes import optimize_dtypes
+from .util import demographic_agg
+from .util import join_years
+from .util import pivot_years
+from .util import repeated_ids
+
+# A long (one row per student per year) source joined onto the cohort as
+# '<col>_<year>' columns. agg is passed to pivot_years, or is a function of
+# the source frame returning it.
+YearlySource = namedtuple('YearlySource', ['name', 'reporting_year', 'drop_cols', 'agg'])
+
+# The sources merge_yearly_gpa, merge_demographic_attendence and
+# merge_address_history join, in the same order
+COHORT_SOURCES = [
+    YearlySource('yearly_gpa', 'ReportingYear', ['SchoolYear'], 'first'),
+    YearlySource('demographic_attendance', 'reporting_year', [], demographic_agg),
+    YearlySource('address_history', 'ReportingYear', [], 'first'),
+]
+
+
+def year_digests(long_df, reporting_year):
+    """
+    Returns {str(year): sha1 hex digest of that year's rows}, hashing the
+    frame once. A year's digest only changes when its own rows do.
+    """
+    row_hashes = pd.util.hash_pandas_object(long_df, index=False).values
+    header = repr(list(long_df.columns)).encode('utf-8')
+    digests = {}
+    for year, positions in long_df.groupby(reporting_year).indices.items():
+        sha = hashlib.sha1(header)
+        sha.update(row_hashes[positions].tobytes())
+        digests[str(year)] = sha.hexdigest()
+    return digests
+
+
+def _storable(df):
+    # nullable integer columns can only be written with pandas >= 1.0, so they're
+    # stored as float64 and optimized back on load
+    nullable = [col for col, dtype in df.dtypes.iteritems()
+                if is_numeric_dtype(dtype) and not isinstance(dtype, np.dtype)]
+    return df.astype(dict((col, np.float64) for col in nullable)) if nullable else df
+
+
+def _to_json(value):
+    # numpy scalars aren't JSON serializable
+    return value.item() if hasattr(value, 'item') else value
+
+
+class IncrementalCohort(object):
+    """
+    A wide cohort frame kept in store_dir together with a manifest of the
+    reporting years it holds for each source, and a digest of each year's rows.
+
+    build only pivots and joins the years that are new or whose rows changed
+    since the last build, and drops the columns of years that were changed or
+    removed. A different cohort or changed joining code means a full rebuild.
+    Saving still rewrites the whole frame.
+
+    Parameters
+    ----------
+    store_dir : str
+        folder holding the frame and its manifest
+    fmt : str
+        'parquet' or 'feather'
+    sources : list of YearlySource
+    id_col : str
+        student identifier column
+    """
+
+    def __init__(self, store_dir, fmt='parquet', sources=COHORT_SOURCES,
+                 id_col='External_Student_ID'):
+        self.store = FrameCache(store_dir, fmt)
+        self.manifest_path = os.path.join(store_dir, 'manifest.json')
+        self.sources = sources
+        self.id_col = id_col
+
+    def _code_digest(self):
+        aggs = [source.agg for source in self.sources if callable(source.agg)]
+        return code_digest(pivot_years, join_years, repeated_ids, *aggs)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path) or 'cohort' not in self.store:
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _load(self, manifest):
+        wide = self.store.load('cohort')
+        if not manifest['optimize']:
+            return wide
+        joined = [col for seen in manifest['sources'].values()
+                  for columns in seen['columns'].values() for col in columns]
+        if not joined:
+            return wide
+        others = [col for col in wide.columns if col not in set(joined)]
+        return pd.concat([wide[others], optimize_dtypes(wide[joined], verbose=False)],
+                         axis=1)[wide.columns]
+
+    def _save(self, wide, manifest):
+        self.store.save('cohort', _storable(wide))
+        # the manifest goes last, so it never describes a frame that wasn't written
+        tmp_path = '{}.{}.tmp'.format(self.manifest_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.rename(tmp_path, self.manifest_path)
+
+    def build(self, cohort_df, long_dfs, optimize=True, verbose=True):
+        """
+        Returns
+        ----------
+        (wide cohort frame, {source name: set of students that appeared more
+        than once in a year of that source})
+
+        Parameters
+        ----------
+        cohort_df : pd.DataFrame
+            one row per student of the cohort
+        long_dfs : dict
+            {source name: the source's full long dataframe}
+        optimize : bool
+            return joined columns in compact dtypes, as join_years does by
+            default (see dtypes.optimize_dtypes). Nullable Int8 columns are
+            stored as float64 and optimized again on load.
+        verbose : bool
+            prints which years were joined
+        """
+        manifest = self.load_manifest()
+        fresh = {'version': CACHE_VERSION, 'cohort': frame_digest(cohort_df),
+                 'code': self._code_digest(), 'optimize': optimize, 'sources': {}}
+        if manifest is None or any(manifest.get(key) != fresh[key]
+                                   for key in ['version', 'cohort', 'code', 'optimize']):
+            if verbose:
+                print 'Building cohort from scratch'
+            wide, manifest = cohort_df, fresh
+        else:
+            wide = self._load(manifest)
+
+        changed = False
+        for source in self.sources:
+            long_df = long_dfs[source.name].drop(source.drop_cols, axis=1)
+            digests = year_digests(long_df, source.reporting_year)
+            seen = manifest['sources'].setdefault(source.name,
+                                                  {'years': {}, 'columns': {}, 'flagged_ids': {}})
+
+            stale = [year for year in seen['years'] if digests.get(year) != seen['years'][year]]
+            if stale:
+                changed = True
+                wide = wide.drop([col for year in stale for col in seen['columns'][year]], axis=1)
+                for year in stale:
+                    for entry in seen.values():
+                        del entry[year]
+
+            todo = long_df[long_df[source.reporting_year].astype(str).isin(
+                [year for year in digests if year not in seen['years']])]
+            if len(todo) == 0:
+                continue
+            changed = True
+            agg = source.agg(long_df) if callable(source.agg) else source.agg
+            before = set(wide.columns)
+            wide = join_years(wide, todo, source.reporting_year, id_col=self.id_col, agg=agg,
+                              optimize=optimize)
+            flagged = repeated_ids(todo, source.reporting_year, self.id_col)
+            for year, rows in todo.groupby(todo[source.reporting_year].astype(str)):
+                suffix = '_' + str(rows[source.reporting_year].iloc[0])
+                seen['years'][year] = digests[year]
+                seen['columns'][year] = [col for col in wide.columns
+                                         if col not in before and col.endswith(suffix)]
+                seen['flagged_ids'][year] = sorted(
+                    _to_json(i) for i in flagged & set(rows[self.id_col]))
+            if verbose:
+                print 'Joined {} years {}'.format(source.name,
+                                                  sorted(todo[source.reporting_year].unique()))
+
+        if changed:
+            wide = wide[self._column_order(cohort_df, manifest, wide)]
+            self._save(wide, manifest)
+        flagged_ids = dict((name, set(i for ids in seen['flagged_ids'].values() for i in ids))
+                           for name, seen in manifest['sources'].items())
+        return wide, flagged_ids
+
+    def _column_order(self, cohort_df, manifest, wide):
+        # the order a full rebuild produces: cohort columns, then each source's year blocks
+        order = list(cohort_df.columns)
+        for source in self.sources:
+            columns = manifest['sources'].get(source.name, {}).get('columns', {})
+            for year in sorted(columns):
+                order.extend(columns[year])
+        ordered = set(order)
+        return order + [col for col in wide.columns if col not in ordered]
+
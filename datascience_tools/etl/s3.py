@@ -0,0 +1,249 @@
+import gzip
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+try:
+    from Queue import Queue, Empty
+    import cPickle as pickle
+except ImportError:  # python 3
+    from queue import Queue, Empty
+    import pickle
+
+MB = 1024 ** 2
+MULTIPART_THRESHOLD = 64 * MB  # files at least this big are uploaded in parts
+PART_SIZE = 16 * MB  # S3 requires parts of at least 5 MB
+SPOOL_MAX_SIZE = 512 * MB  # in-memory buffers bigger than this spill to a temp file
+COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+class UploadResult(namedtuple('UploadResult', ['key_name', 'n_bytes', 'seconds'])):
+    """
+    What was uploaded where, and how fast.
+    """
+
+    @property
+    def mb_per_second(self):
+        if self.seconds == 0:
+            return float('inf')
+        return self.n_bytes / float(MB) / self.seconds
+
+    def __str__(self):
+        return '{}: {:.1f} MB in {:.1f}s ({:.1f} MB/s)'.format(
+            self.key_name, self.n_bytes / float(MB), self.seconds, self.mb_per_second)
+
+
+class BucketPool(object):
+    """
+    Pool of open connections to one bucket. Connections are created on demand
+    and reused, so each upload doesn't pay for a new connection and get_bucket
+    round trip. Each connection is only used by one thread at a time.
+
+    Parameters
+    ----------
+    bucket_name : str
+    connect : function
+        returns a new connection, boto.connect_s3 by default. Swap in a fake
+        (anything with a get_bucket method) for testing.
+    """
+
+    def __init__(self, bucket_name, connect=None):
+        if connect is None:
+            import boto
+            connect = boto.connect_s3
+        self.bucket_name = bucket_name
+        self.connect = connect
+        self._idle = Queue()
+
+    @contextmanager
+    def bucket(self):
+        try:
+            bucket = self._idle.get_nowait()
+        except Empty:
+            bucket = self.connect().get_bucket(self.bucket_name)
+        try:
+            yield bucket
+        finally:
+            self._idle.put(bucket)
+
+
+class S3Uploader(object):
+    """
+    Uploads files to one S3 bucket over pooled connections. Files of at least
+    multipart_threshold bytes are sent as multipart uploads, and upload_files
+    sends a batch of files concurrently.
+
+    Parameters
+    ----------
+    bucket_name : str
+        ex. 'dsapp-edu-data'
+    connect : function
+        returns a new connection, boto.connect_s3 by default
+    max_workers : int
+        number of files upload_files sends at once
+    multipart_threshold : int
+        size in bytes from which files are uploaded in parts
+    part_size : int
+        size in bytes of each part of a multipart upload
+    """
+
+    def __init__(self, bucket_name, connect=None, max_workers=4,
+                 multipart_threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE):
+        self.pool = BucketPool(bucket_name, connect)
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+
+    def upload_file(self, local_path, key_name):
+        """
+        Returns
+        ----------
+        UploadResult
+
+        Parameters
+        ----------
+        local_path : str
+            ex. 'my/local/path/cleaned_data.csv'
+        key_name : str
+            ex. 'NC-Cabarrus/cleaned_data/cleaned_data.csv'
+        """
+        with open(local_path, 'rb') as fp:
+            return self.upload_fileobj(fp, key_name, os.path.getsize(local_path))
+
+    def upload_fileobj(self, fp, key_name, size):
+        """
+        Uploads size bytes read from the start of the open file object fp.
+        """
+        start_time = time.time()
+        with self.pool.bucket() as bucket:
+            if size >= self.multipart_threshold:
+                self._upload_parts(bucket, fp, key_name, size)
+            else:
+                fp.seek(0)
+                bucket.new_key(key_name).set_contents_from_file(fp, size=size)
+        return UploadResult(key_name, size, time.time() - start_time)
+
+    def _upload_parts(self, bucket, fp, key_name, size):
+        multipart = bucket.initiate_multipart_upload(key_name)
+        try:
+            for part_num, offset in enumerate(range(0, size, self.part_size), 1):
+                fp.seek(offset)
+                multipart.upload_part_from_file(fp, part_num, size=min(self.part_size, size - offset))
+            multipart.complete_upload()
+        except Exception:
+            multipart.cancel_upload()  # otherwise S3 keeps (and bills) the parts
+            raise
+
+    def upload_files(self, uploads):
+        """
+        Returns
+        ----------
+        list of UploadResult, in the same order as uploads
+
+        Parameters
+        ----------
+        uploads : list of (local_path, key_name) tuples
+        """
+        pool = ThreadPool(self.max_workers)
+        try:
+            results = pool.map(lambda upload: self.upload_file(*upload), uploads)
+        finally:
+            pool.close()
+            pool.join()
+        return results
+
+
+def report_throughput(results, wall_seconds=None):
+    """
+    Prints one line per upload plus the overall throughput of a batch.
+    wall_seconds defaults to the slowest upload, which is close to the wall
+    clock time of a concurrent batch.
+    """
+    total_bytes = sum(result.n_bytes for result in results)
+    total_seconds = wall_seconds
+    if total_seconds is None:
+        total_seconds = max([result.seconds for result in results] + [0])
+    for result in results:
+        print(str(result))
+    print(str(UploadResult('Total', total_bytes, total_seconds)))
+
+
+def serialize_to_buffer(write, compression=None, max_size=SPOOL_MAX_SIZE):
+    """
+    Returns
+    ----------
+    (buffer, size) : a file object rewound to the start, holding everything
+    write wrote to it, and its size in bytes
+
+    Parameters
+    ----------
+    write : function
+        takes a writable file object and writes the serialized data to it
+    compression : str
+        None, 'gzip' or 'zstd' (needs the zstandard package)
+    max_size : int
+        bytes kept in memory before the buffer spills to a temp file
+    """
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError('Unknown compression: {}'.format(compression))
+    buf = tempfile.SpooledTemporaryFile(max_size=max_size)
+    if compression == 'gzip':
+        compressed = gzip.GzipFile(fileobj=buf, mode='wb')
+        write(compressed)
+        compressed.close()  # leaves buf open
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("compression='zstd' needs the zstandard package")
+        # not closed or used as a context manager: that would close buf too, and
+        # closefd=False is only accepted by zstandard releases without python 2
+        compressed = zstandard.ZstdCompressor().stream_writer(buf)
+        write(compressed)
+        compressed.flush(zstandard.FLUSH_FRAME)
+    else:
+        write(buf)
+    size = buf.tell()
+    buf.seek(0)
+    return buf, size
+
+
+def upload_dataframe(df, key_name, bucket_name, compression=None, **to_csv_kwargs):
+    """
+    Uploads df as a csv, serialized in memory rather than through a local file.
+    Returns an UploadResult.
+    """
+    to_csv_kwargs.setdefault('index', False)
+    buf, size = serialize_to_buffer(lambda f: df.to_csv(f, **to_csv_kwargs), compression)
+    with buf:
+        return get_uploader(bucket_name).upload_fileobj(buf, key_name, size)
+
+
+def upload_pickle(obj, key_name, bucket_name, compression=None):
+    """
+    Uploads obj pickled in memory rather than through a local file. Returns an
+    UploadResult.
+    """
+    buf, size = serialize_to_buffer(lambda f: pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL),
+                                    compression)
+    with buf:
+        return get_uploader(bucket_name).upload_fileobj(buf, key_name, size)
+
+
+_uploaders = {}
+_uploaders_lock = threading.Lock()
+
+
+def get_uploader(bucket_name):
+    """
+    Returns the S3Uploader shared by everything uploading to bucket_name in
+    this process, so its connections are reused across calls.
+    """
+    key = (os.getpid(), bucket_name)  # forked workers must not share sockets
+    with _uploaders_lock:
+        if key not in _uploaders:
+            _uploaders[key] = S3Uploader(bucket_name)
+        return _uploaders[key]
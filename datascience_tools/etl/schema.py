@@ -1,6 +1,11 @@
-from . import db 
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.types import Enum
 
+# Bind to an app with db.init_app(app). Without Flask, db.metadata.create_all(engine)
+# creates the tables and etl.warehouse loads them through a plain engine.
+db = SQLAlchemy()
+
 
 class Student(db.Model):
     """ A Unique Student Record for the 
@@ -10,23 +15,23 @@ class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     firstName = db.Column(db.String)
     lastName = db.Column(db.String)
-    ethnicity = db.Column(Enum('')) # implement some standard here
+    ethnicity = db.Column(db.String) # partners' own codes until we implement some standard here
     yearEnteringNinthGrade = db.Column(db.Integer)
 
 
     ## Features
-    GPAs = db.relationship(backref = 'GPA', lazy='dynamic')
-    Retained = db.relationship(backref = 'Retained', lazy='dynamic')
-    SATs = db.relationship(backref ='sat', lazy = 'dynamic')
-    PSATs = db.relationship(backref = 'psat', lazy = 'dynamic')
-    ACTs = db.relationship(backref = 'act', lazy = 'dynamic')
-    courses = db.relationship(backref = 'courses', lazy = 'dynamic')
-    AbsenceRates = db.relationship(backref = 'AbsenceRate', lazy='dynamic')
-    Suspensions = db.relationship(backref = 'Suspensions', lazy='dynamic')
-    Outcomes= db.relationship(backref = 'outcome', lazy='dynamic')
-    PostSecEnrollment = db.relationship(backref = 'PostSecEnrollment', lazy='dynamic')
-    PostSecOutcome = db.relationship(backref = 'PostSecOutcome', lazy='dynamic')
-    FreeLunch = db.relationship(backref = 'FreeLunch', lazy='dynamic')
+    GPAs = db.relationship('GPA', backref='GPA', lazy='dynamic')
+    Retained = db.relationship('Retained', backref='Retained', lazy='dynamic')
+    SATs = db.relationship('SAT', backref='sat', lazy='dynamic')
+    PSATs = db.relationship('PSAT', backref='psat', lazy='dynamic')
+    ACTs = db.relationship('ACT', backref='act', lazy='dynamic')
+    courses = db.relationship('Course', backref='courses', lazy='dynamic')
+    AbsenceRates = db.relationship('AbsenceRate', backref='AbsenceRate', lazy='dynamic')
+    Suspensions = db.relationship('Suspensions', backref='Suspensions', lazy='dynamic')
+    Outcomes = db.relationship('Outcome', backref='outcome', lazy='dynamic')
+    PostSecEnrollment = db.relationship('PostSecEnrollment', backref='PostSecEnrollment', lazy='dynamic')
+    PostSecOutcome = db.relationship('PostSecOutcome', backref='PostSecOutcome', lazy='dynamic')
+    FreeLunch = db.relationship('FreeLunch', backref='FreeLunch', lazy='dynamic')
 
 # A join table for the Many-To Many Relations
 # See: https://pythonhosted.org/Flask-SQLAlchemy/models.html#many-to-many-relationships
@@ -46,7 +51,7 @@ class District(db.Model):
     location = db.Column(db.String)
     districtType = db.Column(Enum('Public','Charter','Private','International', 
         'Other', name='districtType'))
-    schools = db.relationship(backref='school', lazy='dynamic')
+    schools = db.relationship('School', backref='school', lazy='dynamic')
 
 class School(db.Model):
     """
@@ -63,32 +68,53 @@ class Feature(db.Model):
     """A metaclass the represents the base 
     linking information in a feature tha we use 
     to make modeling descisions. 
-    DO NOT ACCESS THIS CLASS DIRECTLY."""
+    DO NOT ACCESS THIS CLASS DIRECTLY.
+    Each subclass gets its own table, with one row per student per year."""
+    __abstract__ = True
     id = db.Column(db.Integer, primary_key=True)
-    year = db.Column(db.Integer)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.id') 
+    year = db.Column(db.Integer, nullable=False)
+
+    @declared_attr
+    def student_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        # loads upsert on (student_id, year)
+        return (db.UniqueConstraint('student_id', 'year'),)
 
 class GPA(Feature):
     gpa = db.Column(db.Float)
 
 class Retained(Feature):
+    pass
 
 class SAT(Feature):
+    pass
 
 class PSAT(Feature):
+    pass
 
 class ACT(Feature):
+    pass
 
 class Course(Feature):
+    pass
 
 class AbsenceRate(Feature):
+    absence_rate = db.Column(db.Float)
 
 class Suspensions(Feature):
+    pass
 
 class Outcome(Feature):
+    pass
 
 class PostSecEnrollment(Feature):
+    pass
 
 class PostSecOutcome(Feature):
-   
+    pass
+
 class FreeLunch(Feature):
+    pass
@@ -1,15 +1,22 @@
-import boto
 import os
-import sys
+import re
 import pandas as pd
 import datetime
+from pandas.api.types import is_numeric_dtype
+from .cache import code_digest
+from .cache import frame_digest
+from .dtypes import optimize_dtypes
+from .s3 import COMPRESSION_EXTENSIONS
+from .s3 import get_uploader
+from .s3 import upload_dataframe
 
 
 def upload_to_s3(local_file_path, file_name, bucket_name, s3_directory):
 	"""
 	Returns
 	----------
-	Uploads local file to appropriate s3 key, and prints status
+	Uploads local file to appropriate s3 key over a shared, pooled
+	connection, and prints throughput
 
 	Parameters
 	----------
@@ -23,110 +30,205 @@ def upload_to_s3(local_file_path, file_name, bucket_name, s3_directory):
 	    ex. 'NC-Cabarrus/cleaned_data'
 	"""
 
-	def percent_cb(complete, total):
-	    """
-	    Helper function that prints progress
-	    """
-	    sys.stdout.write('.')
-	    sys.stdout.flush()
-
-	conn = boto.connect_s3()
-	bucket = conn.get_bucket(bucket_name)
-	full_key_name = os.path.join(s3_directory, file_name)
-	k = bucket.new_key(full_key_name)
-	full_filepath = os.path.join(local_file_path, file_name)
-	k.set_contents_from_filename(full_filepath, cb=percent_cb, num_cb=10)
+	uploader = get_uploader(bucket_name)
+	result = uploader.upload_file(os.path.join(local_file_path, file_name),
+	                              os.path.join(s3_directory, file_name))
+	print str(result)
 
 	return None
 
 
-def df_to_S3(df, clean_filepath, file_name, s3_bucket, s3_path):
+def df_to_S3(df, clean_filepath, file_name, s3_bucket, s3_path, compression=None):
         """
         Returns
         ----------
-        Uploads a df to s3 as a CSV file.
+        Uploads a df to s3 as a CSV file. The csv is serialized in memory and
+        never written to local disk.
 
         Parameters
         ----------
         df : pd.DataFrame
+        clean_filepath : str
+            unused, kept so existing calls keep working
         file_name: str
             ex: 'stars.csv'
         s3_bucket : str
         s3_path : full path for upload
             ex: '/test/'
+        compression : str
+            None, 'gzip' or 'zstd'. Adds '.gz' or '.zst' to the key name.
         """
-        full_filepath = os.path.join(clean_filepath, file_name)
-        df.to_csv(full_filepath, index=False)
+        key_name = os.path.join(s3_path, file_name) + COMPRESSION_EXTENSIONS[compression]
         print "uploading Dataframe to S3"
-        upload_to_s3(clean_filepath, file_name, s3_bucket, s3_path)
-        print "Complete"
+        result = upload_dataframe(df, key_name, s3_bucket, compression=compression)
+        print str(result)
 
         return None
 
 
-def merge_data_by_years(to_merge, data, reporting_year, how='left'):
+def pivot_years(long_df, reporting_year, id_col='External_Student_ID', agg='first'):
+    """
+    Reshapes a long (one row per student per year) dataframe into a wide one
+    with a '<col>_<year>' block of columns for every reporting year, in a single
+    groupby/unstack.
+
+    Returns
+    ----------
+    pd.DataFrame indexed by id_col
+
+    Parameters
+    ----------
+    long_df : pd.DataFrame
+        must contain id_col and reporting_year
+    reporting_year : str
+        name of the column holding the reporting year
+    id_col : str
+        student identifier column
+    agg : str, function or dict
+        how to collapse students that appear more than once in a year,
+        passed to DataFrameGroupBy.agg. Defaults to keeping the first record.
+    """
+    value_cols = [col for col in long_df.columns if col not in (id_col, reporting_year)]
+    years = sorted(long_df[reporting_year].dropna().unique())
+    wide = long_df.groupby([id_col, reporting_year])[value_cols].agg(agg).unstack(reporting_year)
+    ordered = [(col, year) for year in years for col in value_cols]  # year blocks, as before
+    wide = wide.reindex(columns=pd.MultiIndex.from_tuples(ordered))
+    wide.columns = [col + '_' + str(year) for col, year in ordered]
+    return wide
+
+
+def join_years(cohort_df, long_df, reporting_year, id_col='External_Student_ID',
+               agg='first', how='left', cache=None, optimize=True):
+    """
+    Pivots long_df with pivot_years and joins every year block onto cohort_df
+    with a single merge on id_col. If a FrameCache is given, the joined frame
+    is looked up by the contents of both inputs and only computed on a miss.
+    Unless optimize is False, the joined year blocks are stored in compact
+    dtypes (see dtypes.optimize_dtypes; floats stay float64). This happens
+    after the join, since students missing from long_df turn integer columns
+    back into floats.
+    """
+    def compute():
+        wide = pivot_years(long_df, reporting_year, id_col=id_col, agg=agg)
+        return cohort_df.merge(wide, left_on=id_col, right_index=True, how=how)
+
+    if cache is None:
+        joined = compute()
+    else:
+        key = cache.key(frame_digest(cohort_df), frame_digest(long_df), reporting_year, id_col,
+                        agg, how, code_digest(pivot_years, join_years))
+        joined = cache.get_or_compute(key, compute)
+    if optimize:
+        # the cohort's own columns were optimized at the previous boundary
+        new_cols = joined.columns.difference(cohort_df.columns)
+        joined = pd.concat([joined[cohort_df.columns],
+                            optimize_dtypes(joined[new_cols], verbose=False)],
+                           axis=1)[joined.columns]
+    return joined
+
+
+def merge_data_by_years(to_merge, data, reporting_year, how='left', cache=None, optimize=True):
     """
     Generalized version of merging each particular df
     """
-    groups = to_merge.groupby(reporting_year).groups
-    for group, rows in groups.iteritems():
-        temp = to_merge.ix[rows].drop([reporting_year], axis=1)
-        temp.rename(columns={col: col + '_' + str(group) for col in temp.columns},
-                    inplace=True)  # appends school year to each col
-        data = data.merge(temp, left_on='External_Student_ID',
-                          right_on='External_Student_ID_' + str(group),
-                          how=how)
-        data.drop('External_Student_ID_' + str(group), axis=1, inplace=True)
-    return data
-
-
-def merge_yearly_gpa(cohort_df, yearly_gpa_df):
-	years_in_data = set(yearly_gpa_df['ReportingYear'].unique())
-	for year in years_in_data:
-		yearly_df = yearly_gpa_df[yearly_gpa_df['ReportingYear'] == year]
-		yearly_df.drop(['ReportingYear', 'SchoolYear'], axis=1, inplace=True)
-		yearly_df.rename(columns={col: col + '_' + str(year)
-					for col in yearly_df.columns},
-					inplace=True)
-		cohort_df = cohort_df.merge(yearly_df, left_on='External_Student_ID',
-			right_on = 'External_Student_ID_' + str(year),
-			how='left')
-		cohort_df.drop('External_Student_ID_' + str(year), axis=1, inplace=True)
-	return cohort_df
-
-
-def merge_demographic_attendence(cohort_df, demog_attend_df):
-	years_in_data = set(demog_attend_df['reporting_year'].unique())
-	flagged_ids = set()
-	for year in years_in_data:
-		yearly_df = demog_attend_df[demog_attend_df['reporting_year'] == year]
-		num_appearances = yearly_df['External_Student_ID'].value_counts()
-		flagged_ids = flagged_ids.union(set(num_appearances[num_appearances > 1].index))  # flag collapsed students
-		group_cols = ['External_Student_ID', 'ethnic', 'sex', 'swd', 'eds', 'lep']
-		yearly_df = yearly_df.groupby(by=group_cols, as_index=False).sum() #collapse if appear multiple times
-		yearly_df.rename(columns={col: col + '_' + str(year) for col in yearly_df.columns},
-                    inplace=True)
-		cohort_df = cohort_df.merge(yearly_df,
-			left_on='External_Student_ID',
-			right_on='External_Student_ID_' + str(year),
-			how='left')
-		cohort_df.drop('External_Student_ID_' + str(year), axis=1, inplace=True)
-	return cohort_df, flagged_ids
-
-
-def merge_address_history(cohort_df, add_hist_df):
-	years_in_data = set(add_hist_df['ReportingYear'].unique())
-	for year in years_in_data:
-		yearly_df = add_hist_df[add_hist_df['ReportingYear'] == year]
-		yearly_df.drop('ReportingYear',axis = 1, inplace = True)
-        num_appearances = yearly_df['External_Student_ID'].value_counts()
-        yearly_df.rename(columns={col: col + '_' + str(year) for col in yearly_df.columns}, inplace=True)
-        cohort_df = cohort_df.merge(yearly_df, left_on='External_Student_ID',
-                            right_on = 'External_Student_ID_' + str(year), how='left')
-        cohort_df.drop('External_Student_ID_' + str(year), axis=1, inplace=True)
-	return cohort_df
-
-def make_rename_col_dict(cols, graduating_year):
+    return join_years(data, to_merge, reporting_year, how=how, cache=cache, optimize=optimize)
+
+
+def merge_yearly_gpa(cohort_df, yearly_gpa_df, cache=None, optimize=True):
+    return join_years(cohort_df, yearly_gpa_df.drop('SchoolYear', axis=1), 'ReportingYear',
+                      cache=cache, optimize=optimize)
+
+
+def repeated_ids(long_df, reporting_year, id_col='External_Student_ID'):
+    """
+    Returns the set of students that appear more than once in some year.
+    """
+    appearances = long_df.groupby([reporting_year, id_col]).size()
+    return set(appearances[appearances > 1].index.get_level_values(id_col))
+
+
+def demographic_agg(demog_attend_df):
+    """
+    Returns the agg for collapsing repeated demographic and attendance
+    records: summed numeric attendance counts, and the first value of the
+    demographic columns and of any other non-numeric column (e.g. school).
+    """
+    group_cols = ['ethnic', 'sex', 'swd', 'eds', 'lep']
+    return dict((col, 'sum' if col not in group_cols and is_numeric_dtype(dtype) else 'first')
+                for col, dtype in demog_attend_df.dtypes.iteritems()
+                if col not in ('reporting_year', 'External_Student_ID'))
+
+
+def merge_demographic_attendence(cohort_df, demog_attend_df, cache=None, optimize=True):
+    """
+    Returns the cohort with yearly demographic and attendance columns joined
+    on, along with the set of students that appeared more than once in a year
+    and had their records collapsed (attendance counts are summed).
+    """
+    flagged_ids = repeated_ids(demog_attend_df, 'reporting_year')
+    cohort_df = join_years(cohort_df, demog_attend_df, 'reporting_year',
+                           agg=demographic_agg(demog_attend_df), cache=cache, optimize=optimize)
+    return cohort_df, flagged_ids
+
+
+def merge_address_history(cohort_df, add_hist_df, cache=None, optimize=True):
+    return join_years(cohort_df, add_hist_df, 'ReportingYear', cache=cache, optimize=optimize)
+
+class GradeRenamer(object):
+    """
+    Renames year-suffixed columns to the grade the cohort was in that year,
+    e.g. 'GPA_2008' --> 'GPA_8th_grade' for students in class of 2012.
+
+    All the cohort's years are matched with one compiled pattern, and each
+    column's new name is memoized, so renaming a frame again is a dict lookup
+    per column. Use grade_renamer to share instances.
+
+    Parameters
+    ----------
+    graduating_year : int
+        expected graduating year for a cohort
+    earliest_grade : int
+        earliest grade to rename a year for
+    """
+
+    def __init__(self, graduating_year, earliest_grade=8):
+        self.year_to_grade = dict((str(graduating_year - (12 - grade)), str(grade) + 'th_grade')
+                                  for grade in range(earliest_grade, 13))
+        self.pattern = re.compile('|'.join(sorted(self.year_to_grade)))
+        self._names = {}
+
+    def rename(self, col):
+        try:
+            return self._names[col]
+        except KeyError:
+            pass
+        try:
+            years = self.pattern.findall(col)
+        except TypeError:  # not a string column name
+            years = []
+        # a column mentioning several of the years is named for the latest one
+        new_name = col.replace(max(years), self.year_to_grade[max(years)]) if years else col
+        self._names[col] = new_name
+        return new_name
+
+    def mapping(self, cols):
+        return dict((col, self.rename(col)) for col in cols)
+
+
+_GRADE_RENAMERS = {}
+
+
+def grade_renamer(graduating_year, earliest_grade=8):
+    """
+    Returns the GradeRenamer for a cohort, compiling it on first use.
+    """
+    key = (graduating_year, earliest_grade)
+    if key not in _GRADE_RENAMERS:
+        _GRADE_RENAMERS[key] = GradeRenamer(graduating_year, earliest_grade)
+    return _GRADE_RENAMERS[key]
+
+
+def make_rename_col_dict(cols, graduating_year, earliest_grade=8):
     """
     Returns dictionary to rename columns respective to each graduating year
     e.g., 'GPA_2008' --> 'GPA_8th_grade' for students in class of 2012
@@ -141,25 +243,45 @@ def make_rename_col_dict(cols, graduating_year):
         list of all columns to rename
     graduating_year : int
         expected graduating year for a cohort
+    earliest_grade : int
+        earliest grade to rename a year for
     """
-    d = {col: col for col in cols}
-    mappings = zip(range(8, 13), range(graduating_year-4, graduating_year+1))
-    for grade, year in mappings:
-        append = str(grade) + 'th_grade'
-        temp = {col: col.replace(str(year), append) for col in cols if str(year) in col}
-        d.update(temp)
-    return d
+    return grade_renamer(graduating_year, earliest_grade).mapping(cols)
 
 
 # The dfSusp data, which is the last file in the list, needs to have
 # a new column created with a converted reporting year
-def convert_to_reporting_year(date_string):
+def convert_to_reporting_year(date_string, cutover_month=7):
     if pd.isnull(date_string):
         return date_string
     else:
         converted_date = datetime.datetime.strptime(date_string, '%m/%d/%Y')
-        if converted_date.month <= 7: # if it happened during second semester
+        if converted_date.month <= cutover_month: # if it happened during second semester
             return converted_date.year # reporting year happens at the end of a school year
         else: # if it happened during first semester
             return converted_date.year + 1
 
+
+def convert_dates_to_reporting_year(dates, cutover_month=7, date_format='%m/%d/%Y'):
+    """
+    Vectorized version of convert_to_reporting_year. Parses a whole column of
+    dates at once and maps each one to the reporting year of the school year it
+    falls in.
+
+    Returns
+    ----------
+    pd.Series of floats (NaN where the date is null or unparseable)
+
+    Parameters
+    ----------
+    dates : pd.Series
+        date strings, e.g. the 'Incident Date' column of the suspension data
+    cutover_month : int
+        last month (1-12) that still belongs to the school year ending that
+        calendar year. Dates after this month roll over to the next reporting year.
+    date_format : str
+        strptime-style format of the date strings
+    """
+    parsed = pd.to_datetime(pd.Series(dates), format=date_format, errors='coerce')
+    reporting_year = parsed.dt.year + (parsed.dt.month > cutover_month)
+    return reporting_year.astype(float)
@@ -0,0 +1,233 @@
+import re
+from collections import namedtuple
+import pandas as pd
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import select
+
+# Rows per transaction. Each batch is sent as one executemany.
+BATCH_SIZE = 5000
+
+_YEAR_SUFFIX = re.compile(r'^(.*)_(\d{4})$')
+
+
+def frame_records(df):
+    """
+    Returns the rows of df as dicts of plain python values, with missing
+    values as None, ready to pass to executemany.
+    """
+    values = df.astype(object).where(df.notnull(), None)
+    return [dict(zip(df.columns, [v.item() if hasattr(v, 'item') else v for v in row]))
+            for row in values.itertuples(index=False)]
+
+
+def _upsert_statement(conn, table, key_cols, update_cols):
+    # native INSERT ... ON CONFLICT where the dialect supports it
+    insert = None
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif conn.dialect.name == 'sqlite':
+        try:
+            from sqlalchemy.dialects.sqlite import insert  # SQLAlchemy >= 1.4
+        except ImportError:
+            pass
+    if insert is None:
+        return None
+    statement = insert(table)
+    if not update_cols:
+        return statement.on_conflict_do_nothing(index_elements=key_cols)
+    return statement.on_conflict_do_update(
+        index_elements=key_cols, set_=dict((col, statement.excluded[col]) for col in update_cols))
+
+
+def upsert_rows(conn, table, rows, key_cols):
+    """
+    Inserts rows (a list of dicts) into table, replacing the values of rows
+    whose key_cols already exist. Runs as one executemany, or, on databases
+    without INSERT ... ON CONFLICT, one executemany delete of the existing
+    keys and one executemany insert.
+    """
+    if not rows:
+        return
+    update_cols = [col for col in rows[0] if col not in key_cols]
+    statement = _upsert_statement(conn, table, key_cols, update_cols)
+    if statement is not None:
+        conn.execute(statement, rows)
+        return
+    delete = table.delete().where(and_(*[table.c[col] == bindparam('key_' + col)
+                                         for col in key_cols]))
+    conn.execute(delete, [dict(('key_' + col, row[col]) for col in key_cols) for row in rows])
+    conn.execute(table.insert(), rows)
+
+
+def load_frame(engine, table, df, key_cols, batch_size=BATCH_SIZE):
+    """
+    Upserts every row of df into table, batch_size rows per transaction.
+    df's columns must be named after table's. Returns the number of rows loaded.
+
+    For PostgreSQL, create the engine with executemany_mode='values' so each
+    batch goes out as a multi-row INSERT.
+    """
+    df = df.dropna(subset=key_cols).drop_duplicates(subset=key_cols, keep='last')
+    for start in range(0, len(df), batch_size):
+        rows = frame_records(df.iloc[start:start + batch_size])
+        with engine.begin() as conn:  # one transaction per batch
+            upsert_rows(conn, table, rows, key_cols)
+    return len(df)
+
+
+def load_students(engine, df, id_col='External_Student_ID', columns={}, batch_size=BATCH_SIZE):
+    """
+    Upserts one Student per distinct id_col.
+
+    Parameters
+    ----------
+    engine : sqlalchemy engine
+    df : pd.DataFrame
+    id_col : str
+        column holding the student id
+    columns : dict
+        {frame column: Student column}, e.g. {'ethnic': 'ethnicity'}
+    batch_size : int
+    """
+    from .schema import Student
+    students = df[[id_col] + list(columns)].rename(columns=dict(columns, **{id_col: 'id'}))
+    students = students.dropna(subset=['id'])
+    students['id'] = students['id'].astype('int64')
+    return load_frame(engine, Student.__table__, students, ['id'], batch_size)
+
+
+def load_feature(engine, feature, df, values, id_col='External_Student_ID',
+                 year_col='reporting_year', batch_size=BATCH_SIZE):
+    """
+    Upserts a long (one row per student per year) frame into a Feature table,
+    e.g. load_feature(engine, schema.GPA, yearly_gpa_df, {'gpa': 'gpa'},
+    year_col='ReportingYear'). A student's existing row for a year is updated.
+    Returns the number of rows loaded.
+
+    Parameters
+    ----------
+    engine : sqlalchemy engine
+    feature : Feature subclass from etl.schema
+    df : pd.DataFrame
+    values : dict
+        {frame column: feature column}
+    id_col : str
+    year_col : str
+        column holding the (reporting) year
+    batch_size : int
+    """
+    rows = df[[id_col, year_col] + list(values)].rename(
+        columns=dict(values, **{id_col: 'student_id', year_col: 'year'}))
+    rows = rows.dropna(subset=['student_id', 'year'])
+    rows['student_id'] = rows['student_id'].astype('int64')
+    rows['year'] = rows['year'].astype('int64')
+    return load_frame(engine, feature.__table__, rows, ['student_id', 'year'], batch_size)
+
+
+def melt_years(wide_df, columns, id_col='External_Student_ID'):
+    """
+    Turns the '<col>_<year>' blocks of a wide cohort frame back into a long
+    frame with id_col, 'year' and one column per name in columns, for loading
+    with load_feature.
+    """
+    blocks = []
+    for wide_col in wide_df.columns:
+        match = _YEAR_SUFFIX.match(str(wide_col))
+        if match and match.group(1) in columns:
+            blocks.append(pd.DataFrame({id_col: wide_df[id_col].values,
+                                        'year': int(match.group(2)),
+                                        'col': match.group(1),
+                                        'value': wide_df[wide_col].values}))
+    if not blocks:
+        return pd.DataFrame(columns=[id_col, 'year'] + list(columns))
+    long_df = pd.concat(blocks, ignore_index=True).dropna(subset=['value'])
+    long_df = long_df.pivot_table(index=[id_col, 'year'], columns='col', values='value',
+                                  aggfunc='first')
+    long_df.columns.name = None
+    return long_df.reset_index()
+
+
+class FeatureSpec(namedtuple('FeatureSpec', ['feature', 'columns', 'years'])):
+    """
+    Which columns of a Feature table to extract, for which years. They come
+    out as '<column>_<year>' columns, like the etl merges produce.
+
+    years are stored as a tuple of ints, so 2010 and '2010' name the same
+    year in the query and in the column names.
+    """
+
+    def __new__(cls, feature, columns, years):
+        return super(FeatureSpec, cls).__new__(cls, feature, columns,
+                                               tuple(int(year) for year in years))
+
+
+def feature_columns(specs):
+    """
+    Returns the names of the columns extract_features adds for specs, in order.
+    """
+    return ['{}_{}'.format(col, year) for spec in specs for year in spec.years
+            for col in spec.columns]
+
+
+def _extract_feature(conn, spec, cohort_ids):
+    # one query joining the feature table on the cohort's ids, pivoted to '<column>_<year>'
+    table = spec.feature.__table__
+    query = (select([table.c.student_id, table.c.year] + [table.c[col] for col in spec.columns])
+             .select_from(table.join(cohort_ids, table.c.student_id == cohort_ids.c.student_id))
+             .where(table.c.year.in_(spec.years)))
+    long_df = pd.read_sql(query, conn)
+    wide = long_df.set_index(['student_id', 'year'])[list(spec.columns)].unstack('year')
+    wide = wide.reindex(columns=pd.MultiIndex.from_tuples(
+        [(col, year) for year in spec.years for col in spec.columns]))
+    wide.columns = ['{}_{}'.format(col, year) for col, year in wide.columns]
+    return wide
+
+
+def extract_features(engine, cohort_df, specs, id_col='External_Student_ID',
+                     batch_size=BATCH_SIZE):
+    """
+    Returns cohort_df with the features in specs joined on as '<column>_<year>'
+    columns (see feature_columns), NaN where a student has no row for a year.
+
+    The cohort's ids go into a temporary table once, and each feature table
+    is then read with one query joining it on (student_id, year), which the
+    table's unique constraint indexes. The result can go straight into
+    run_model with features=feature_columns(specs).
+
+    Parameters
+    ----------
+    engine : sqlalchemy engine
+    cohort_df : pd.DataFrame
+        one row per student
+    specs : list of FeatureSpec
+    id_col : str
+        column of cohort_df holding the student id
+    batch_size : int
+        ids inserted into the temporary table per executemany
+    """
+    cohort_ids = Table('cohort_ids', MetaData(),
+                       Column('student_id', Integer, primary_key=True),
+                       prefixes=['TEMPORARY'])
+    ids = pd.unique(cohort_df[id_col].dropna().astype('int64'))
+    wide_blocks = []
+    with engine.connect() as conn:
+        try:
+            with conn.begin():
+                cohort_ids.create(conn)
+                for start in range(0, len(ids), batch_size):
+                    conn.execute(cohort_ids.insert(),
+                                 [{'student_id': int(i)} for i in ids[start:start + batch_size]])
+                for spec in specs:
+                    wide_blocks.append(_extract_feature(conn, spec, cohort_ids))
+        finally:
+            # the connection goes back to the pool, so a failed call mustn't leave the table behind
+            cohort_ids.drop(conn, checkfirst=True)
+
+    features = pd.concat(wide_blocks, axis=1) if wide_blocks else pd.DataFrame(index=ids)
+    features = features.reindex(columns=feature_columns(specs))
+    return cohort_df.merge(features, left_on=id_col, right_index=True, how='left')
@@ -1,5 +1,9 @@
 from .workflow_data_audit import print_null_columns
+from .workflow_profile import profile
+from .workflow_profile import profile_csv
 
 __all__ = [
     'print_null_columns',
+    'profile',
+    'profile_csv',
 ]
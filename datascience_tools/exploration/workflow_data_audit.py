@@ -1,16 +1,16 @@
+from workflow_profile import profile
+
 def print_null_columns(dataframe):
     """
     Prints the column name and percent null
+    See workflow_profile.profile for a fuller report that can be used programmatically.
     Parameters:
         dataframe : pd.DataFrame
     Returns:
         None
     """
-    cols = dataframe.columns
-    nrows = dataframe.shape[0]
-    print 'Total rows: {}'.format(nrows)
-    nrows = float(nrows)
-    for i, col in enumerate(cols):
-        n_null = dataframe[col].isnull().sum()
-        percent_null = n_null/nrows * 100
+    report = profile(dataframe, quantiles=[], distinct=False)
+    print 'Total rows: {}'.format(report.n_rows)
+    for i, (col, null_rate) in enumerate(report.columns['null_rate'].iteritems()):
+        percent_null = null_rate * 100
         print '{}. {} - {:.2f}%'.format(i+1, col, percent_null)
@@ -0,0 +1,248 @@
+import re
+import warnings
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+# '<col>_<year>' or '<col>_<grade>th_grade' columns, grouped for year coverage
+_YEAR_SUFFIX = re.compile(r'^(.*)_(\d{4}|\d+th_grade)$')
+
+ProfileReport = namedtuple('ProfileReport', ['n_rows', 'columns', 'year_coverage'])
+
+
+def _as_float(s):
+    # per column, so nullable integers come out with NaN for their missing values
+    return s.astype(np.float64).values
+
+
+def _combined_dtype(seen, dtype):
+    """
+    The dtype a column has across two chunks, e.g. float64 for an int64 chunk
+    followed by a float64 one, and object once a chunk holds strings.
+    """
+    if seen == dtype:
+        return seen
+    if is_numeric_dtype(seen) and is_numeric_dtype(dtype):
+        if isinstance(seen, np.dtype) and isinstance(dtype, np.dtype):
+            return np.promote_types(seen, dtype)
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+class _DistinctSketch(object):
+    """
+    K-minimum-values sketch of the distinct values of one column: keeps the k
+    smallest distinct 64-bit hashes seen. Exact while a column has fewer than
+    k distinct values, an estimate with roughly 1/sqrt(k) relative error after.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.hashes = np.array([], dtype=np.uint64)
+
+    def update(self, values):
+        hashes = np.unique(pd.util.hash_array(values))[:self.k]
+        self.hashes = np.union1d(self.hashes, hashes)[:self.k]
+
+    @property
+    def exact(self):
+        return len(self.hashes) < self.k
+
+    def estimate(self):
+        if self.exact:
+            return len(self.hashes)
+        return int(round((self.k - 1) / (float(self.hashes[-1]) / 2 ** 64)))
+
+
+class Profiler(object):
+    """
+    Accumulates a profile of a dataframe one chunk at a time, so files that
+    don't fit in memory can be streamed through it (see profile).
+
+    Counts, and the min and max of numeric columns, are reduced over each
+    chunk's whole numeric block at once. Quantiles come from a uniform sample
+    of up to sample_size rows, kept by giving every row a random key and
+    keeping the rows with the smallest keys. Distinct counts come from a
+    _DistinctSketch per column.
+
+    Column dtypes are rechecked on every chunk: a column that turns out to
+    hold strings is dropped from the numeric statistics, and numbers are
+    counted as distinct by their float64 value.
+
+    Parameters
+    ----------
+    quantiles : list of floats in [0, 1]
+    sample_size : int
+    distinct : bool
+        whether to count distinct values
+    distinct_k : int
+        sketch size; distinct counts are exact below it
+    seed : int
+    """
+
+    def __init__(self, quantiles=(0.25, 0.5, 0.75), sample_size=10000, distinct=True,
+                 distinct_k=4096, seed=None):
+        self.quantiles = list(quantiles)
+        self.sample_size = sample_size
+        self.distinct = distinct
+        self.distinct_k = distinct_k
+        self._rng = np.random.RandomState(seed)
+        self.n_rows = 0
+        self.columns = None
+
+    def _start(self, chunk):
+        self.columns = list(chunk.columns)
+        self.dtypes = dict(chunk.dtypes.iteritems())
+        self.numeric = [col for col in self.columns if is_numeric_dtype(self.dtypes[col])]
+        self.ever_numeric = set(self.numeric)
+        self.counts = pd.Series(0, index=chunk.columns)
+        self.minimum = np.full(len(self.numeric), np.inf)
+        self.maximum = np.full(len(self.numeric), -np.inf)
+        self.sample = np.empty((0, len(self.numeric)))
+        self.sample_keys = np.empty(0)
+        self.sketches = dict((col, _DistinctSketch(self.distinct_k)) for col in self.columns)
+
+    def _update_dtypes(self, chunk):
+        # a column parsed as numbers so far can turn out to hold strings in a later chunk
+        for col, dtype in chunk.dtypes.iteritems():
+            self.dtypes[col] = _combined_dtype(self.dtypes[col], dtype)
+        keep = [i for i, col in enumerate(self.numeric) if is_numeric_dtype(self.dtypes[col])]
+        if len(keep) < len(self.numeric):
+            self.numeric = [self.numeric[i] for i in keep]
+            self.minimum, self.maximum = self.minimum[keep], self.maximum[keep]
+            self.sample = self.sample[:, keep]
+
+    def _update_distinct(self, col, s):
+        values = s.dropna()
+        if not len(values):
+            return
+        sketch = self.sketches[col]
+        if is_numeric_dtype(values.dtype):
+            # as float64, so 1 from an int chunk and 1.0 from a float chunk are one value
+            sketch.update(_as_float(values))
+            return
+        if col in self.ever_numeric:
+            # numbers parsed from the text of a column that was numeric in earlier chunks
+            numbers = pd.to_numeric(values, errors='coerce')
+            parsed = numbers.notnull()
+            if parsed.any():
+                sketch.update(numbers[parsed].values.astype(np.float64))
+            values = values[~parsed]
+            if not len(values):
+                return
+        sketch.update(np.asarray(values))
+
+    def update(self, chunk):
+        if self.columns is None:
+            self._start(chunk)
+        else:
+            if list(chunk.columns) != self.columns:
+                chunk = chunk[self.columns]
+            self._update_dtypes(chunk)
+        self.n_rows += len(chunk)
+        self.counts += chunk.count()
+
+        if self.numeric and len(chunk):
+            block = np.column_stack([_as_float(chunk[col]) for col in self.numeric])
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # all-null columns
+                self.minimum = np.fmin(self.minimum, np.nanmin(block, axis=0))
+                self.maximum = np.fmax(self.maximum, np.nanmax(block, axis=0))
+            if self.quantiles:
+                keys = np.r_[self.sample_keys, self._rng.random_sample(len(block))]
+                rows = np.vstack([self.sample, block])
+                if len(keys) > self.sample_size:
+                    keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                    keys, rows = keys[keep], rows[keep]
+                self.sample_keys, self.sample = keys, rows
+
+        if self.distinct:
+            for col in self.columns:
+                self._update_distinct(col, chunk[col])
+        return self
+
+    def report(self):
+        """
+        Returns
+        ----------
+        ProfileReport with
+        n_rows : int
+        columns : pd.DataFrame
+            one row per column: dtype, count, null_rate, distinct (and whether
+            it is exact), and for numeric columns min, max and the quantiles
+        year_coverage : pd.DataFrame
+            for year-suffixed columns, the non-null rate of each base column
+            (rows) in each year (columns). NaN where a column has no such year.
+        """
+        if self.columns is None:
+            return ProfileReport(0, pd.DataFrame(), pd.DataFrame())
+        columns = pd.DataFrame({'dtype': pd.Series(self.dtypes).astype(str),
+                                'count': self.counts,
+                                'null_rate': 1 - self.counts / float(max(self.n_rows, 1))},
+                               index=self.columns, columns=['dtype', 'count', 'null_rate'])
+        if self.distinct:
+            columns['distinct'] = [self.sketches[col].estimate() for col in self.columns]
+            columns['distinct_exact'] = [self.sketches[col].exact for col in self.columns]
+        numeric = pd.DataFrame(index=self.numeric)
+        numeric['min'] = np.where(np.isinf(self.minimum), np.nan, self.minimum)
+        numeric['max'] = np.where(np.isinf(self.maximum), np.nan, self.maximum)
+        if self.quantiles and len(self.sample):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values = np.nanpercentile(self.sample, [100 * q for q in self.quantiles], axis=0)
+            for q, row in zip(self.quantiles, np.atleast_2d(values)):
+                numeric['q{:g}'.format(100 * q)] = row
+        columns = columns.join(numeric)
+        return ProfileReport(self.n_rows, columns, year_coverage(columns))
+
+
+def year_coverage(columns):
+    """
+    Returns the non-null rate of each year-suffixed column, with base column
+    names as rows and years (or grades) as columns.
+
+    Parameters
+    ----------
+    columns : pd.DataFrame
+        a ProfileReport's columns
+    """
+    matches = [(_YEAR_SUFFIX.match(str(col)), col) for col in columns.index]
+    rows = [(match.group(1), match.group(2), 1 - columns.at[col, 'null_rate'])
+            for match, col in matches if match]
+    if not rows:
+        return pd.DataFrame()
+    coverage = pd.DataFrame(rows, columns=['column', 'year', 'coverage'])
+    return coverage.pivot(index='column', columns='year', values='coverage')
+
+
+def profile(data, quantiles=(0.25, 0.5, 0.75), sample_size=10000, distinct=True,
+            distinct_k=4096, seed=None):
+    """
+    Returns a ProfileReport (see Profiler.report) for data.
+
+    Parameters
+    ----------
+    data : pd.DataFrame or iterable of pd.DataFrame
+        a frame, or its chunks, e.g. pd.read_csv(path, chunksize=100000)
+    quantiles, sample_size, distinct, distinct_k, seed :
+        see Profiler
+    """
+    profiler = Profiler(quantiles=quantiles, sample_size=sample_size, distinct=distinct,
+                        distinct_k=distinct_k, seed=seed)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    for chunk in chunks:
+        profiler.update(chunk)
+    return profiler.report()
+
+
+def profile_csv(path, chunksize=100000, read_func=pd.read_csv, **kwargs):
+    """
+    Profiles a delimited file chunksize rows at a time. kwargs are split
+    between profile (quantiles, sample_size, distinct, distinct_k, seed) and
+    read_func.
+    """
+    profile_kwargs = dict((key, kwargs.pop(key)) for key in
+                          ['quantiles', 'sample_size', 'distinct', 'distinct_k', 'seed']
+                          if key in kwargs)
+    return profile(read_func(path, chunksize=chunksize, **kwargs), **profile_kwargs)
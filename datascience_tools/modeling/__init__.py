@@ -4,10 +4,26 @@ from .workflow_diagnostics import plot_feature_importance
 from .workflow_diagnostics import plot_marginal_precision_curve
 from .workflow_diagnostics import precision_at_top_x
 from .workflow_diagnostics import get_diagnostics_dict
+from .workflow_ranking import precision_at_cutoffs
+from .workflow_calibration import marginal_precision
+from .workflow_calibration import calibration_curve
+from .workflow_metrics import compute_diagnostics
+from .workflow_plotting import render_diagnostics
+from .workflow_importance import forest_importance_stats
+from .workflow_importance import permutation_importance
+from .workflow_bootstrap import bootstrap_diagnostics
+from .workflow_results import ResultsStore
+from .workflow_imputation import EmpiricalImputer
+from .workflow_imputation import Imputer
+from .workflow_partners import PartnerAdapter
+from .workflow_partners import register_partner
 from .workflow_model_setup import run_model
 from .workflow_preprocessing import preprocess_data
 from .workflow_preprocessing import impute_data
-from .workflow_preprocessing import empirical imputation
+from .workflow_preprocessing import empirical_imputation
+from .workflow_features import FeatureMatrixCache
+from .workflow_grid import ModelSpec
+from .workflow_grid import run_model_grid
 
 __all__ = [
     'plot_roc_curve',
@@ -16,8 +32,24 @@ __all__ = [
     'plot_marginal_precision_curve',
     'precision_at_top_x',
     'get_diagnostics_dict',
+    'precision_at_cutoffs',
+    'marginal_precision',
+    'calibration_curve',
+    'compute_diagnostics',
+    'render_diagnostics',
+    'forest_importance_stats',
+    'permutation_importance',
+    'bootstrap_diagnostics',
+    'ResultsStore',
+    'EmpiricalImputer',
+    'Imputer',
+    'PartnerAdapter',
+    'register_partner',
     'run_model',
     'preprocess_data',
     'impute_data',
     'empirical_imputation',
+    'FeatureMatrixCache',
+    'ModelSpec',
+    'run_model_grid',
 ]
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+def make_rng(seed=None):
+    """
+    Returns a numpy random Generator seeded with seed, falling back to a
+    RandomState on numpy versions that predate Generator. Only use methods
+    both share (e.g. choice, permutation).
+    """
+    if hasattr(np.random, 'default_rng'):
+        return np.random.default_rng(seed)
+    return np.random.RandomState(seed)
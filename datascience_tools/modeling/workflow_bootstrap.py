@@ -0,0 +1,146 @@
+from random_util import make_rng
+import multiprocessing
+import numpy as np
+
+# Sorted test data shared with forked worker processes, so it isn't pickled per batch
+_shared = {}
+
+# Resamples per batch are chosen so a batch holds about this many cells
+BATCH_CELLS = 5 * 10**6
+
+
+def _batch_metrics(args):
+    seed, n_resamples = args
+    n = len(_shared['y_sorted'])
+
+    # A resample is represented by how many times it draws each (sorted) row,
+    # so every resample shares the one sort of the scores.
+    draws = make_rng(seed).choice(n, size=(n_resamples, n))
+    offsets = (np.arange(n_resamples) * n)[:, np.newaxis]
+    weights = np.bincount((draws + offsets).ravel(), minlength=n_resamples * n)
+    weights = weights.reshape(n_resamples, n).astype(np.float64)
+    del draws
+    return _resample_metrics(weights, _shared['y_sorted'], _shared['last_of_ties'],
+                             _shared['top_n'], _shared['top_p'])
+
+
+def _resample_metrics(weights, y, last_of_ties, top_n, top_p):
+    """
+    Metrics of each resample, given as a row of weights: how many times it
+    draws each row of the score-sorted labels y. last_of_ties holds the
+    position of the last row of every group of tied scores.
+    """
+    n_resamples, n = weights.shape
+    cum_weights = np.cumsum(weights, axis=1)
+    cum_positives = np.cumsum(weights * y, axis=1)
+    metrics = {}
+
+    # same curve points as sklearn: one per distinct score. Both AUCs are
+    # trapezoids over raw counts, normalized once per resample at the end.
+    tps = cum_positives[:, last_of_ties]
+    fps = cum_weights[:, last_of_ties] - tps
+    positives, negatives = tps[:, -1], fps[:, -1]
+    d_tps = np.diff(tps, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics['ROC AUC'] = ((fps[:, 0] * tps[:, 0]
+                               + (np.diff(fps, axis=1) * (tps[:, 1:] + tps[:, :-1])).sum(axis=1))
+                              / (2.0 * positives * negatives))
+        # scores ranked above every draw of a resample sit at the (0, 1) start point
+        predicted_positive = tps + fps
+        precision = np.where(predicted_positive > 0, tps / predicted_positive, 1.0)
+        metrics['PR AUC'] = ((tps[:, 0] * (1 + precision[:, 0])
+                              + (d_tps * (precision[:, 1:] + precision[:, :-1])).sum(axis=1))
+                             / (2.0 * positives))
+
+    def precision_at(k):
+        # positives among the first k draws in score order; the row where the
+        # k-th draw falls may only be partly included
+        k = min(k, n)
+        if k <= 0:
+            return np.full(n_resamples, np.nan)
+        boundary = np.array([np.searchsorted(row, k) for row in cum_weights])
+        rows = np.arange(n_resamples)
+        before = np.where(boundary > 0, cum_weights[rows, boundary - 1], 0)
+        positives_before = np.where(boundary > 0, cum_positives[rows, boundary - 1], 0)
+        return (positives_before + (k - before) * y[boundary]) / float(k) * 100
+
+    metrics['% outcome on top x students'] = [precision_at(k) for k in top_n]
+    metrics['% outcome on top p% students'] = [precision_at(int(np.floor(p / 100.0 * n)))
+                                              for p in top_p]
+    return metrics
+
+
+def bootstrap_diagnostics(y_test, predicted_probs, n_resamples=1000, top_n=[30,50,100,200],
+                          top_p=[5,10,20,30,50], alpha=0.05, seed=None, n_jobs=1,
+                          batch_size=None):
+    """
+    Bootstrap percentile confidence intervals for the metrics get_diagnostics_dict
+    reports: ROC AUC, PR AUC and % outcome on the top x students / top p%.
+
+    Scores are sorted once; each resample is then a vector of draw counts over
+    the sorted rows, and resamples are evaluated in vectorized batches.
+
+    Returns
+    ----------
+    dict with the same keys as get_diagnostics_dict. AUCs map to a
+    (low, high) tuple and the top x / top p% entries to a list of them, one
+    per cutoff.
+
+    Parameters
+    ----------
+    y_test : array
+        true labels
+    predicted_probs : array
+        predicted probabilities of class 1
+    n_resamples : int
+    top_n : list of ints
+    top_p : list of percentages (0-100)
+    alpha : float
+        intervals cover the middle 1 - alpha of the resampled values
+    seed : int
+        results are reproducible for a given seed, batch_size and n_resamples
+    n_jobs : int
+        number of processes to spread the batches over
+    batch_size : int
+        resamples per batch. Defaults to keeping each batch around BATCH_CELLS cells.
+    """
+    predicted_probs = np.asarray(predicted_probs, dtype=np.float64)
+    order = np.argsort(-predicted_probs, kind='mergesort')
+    sorted_probs = predicted_probs[order]
+    n = len(order)
+    if batch_size is None:
+        batch_size = max(1, BATCH_CELLS // max(n, 1))
+
+    batch_sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    batch_seeds = make_rng(seed).choice(2**31 - 1, size=len(batch_sizes))
+    tasks = [(int(batch_seed), size) for batch_seed, size in zip(batch_seeds, batch_sizes)]
+
+    _shared['y_sorted'] = (np.asarray(y_test)[order] == 1).astype(np.float64)
+    _shared['last_of_ties'] = np.r_[np.flatnonzero(np.diff(sorted_probs)), n - 1]
+    _shared['top_n'] = list(top_n)
+    _shared['top_p'] = list(top_p)
+    try:
+        if n_jobs <= 1:
+            batches = map(_batch_metrics, tasks)
+        else:
+            pool = multiprocessing.Pool(n_jobs)
+            try:
+                batches = pool.map(_batch_metrics, tasks)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _shared.clear()
+
+    def interval(values):
+        low, high = np.nanpercentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+        return (round(low, 3), round(high, 3))
+
+    intervals = {}
+    for key in ['ROC AUC', 'PR AUC']:
+        intervals[key] = interval(np.concatenate([batch[key] for batch in batches]))
+    for key in ['% outcome on top x students', '% outcome on top p% students']:
+        n_cutoffs = len(batches[0][key]) if batches else 0
+        intervals[key] = [interval(np.concatenate([batch[key][i] for batch in batches]))
+                          for i in range(n_cutoffs)]
+    return intervals
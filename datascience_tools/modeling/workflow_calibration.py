@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+def marginal_precision(labels, predicted_probs):
+    """
+    Observed rate of the outcome among students with each distinct predicted
+    probability, in one groupby pass.
+
+    Returns
+    ----------
+    pd.DataFrame with columns probs, total, trues and marginal (trues / total),
+    sorted by probs
+
+    Parameters
+    ----------
+    labels : array
+        true labels, 1 for the positive class
+    predicted_probs : array
+        predicted probabilities of class 1
+    """
+    df = pd.DataFrame(data={'outcome': np.asarray(labels) == 1,
+                            'probs': np.asarray(predicted_probs)})
+    grouped = df.groupby('probs')['outcome'].agg(['size', 'sum'])
+    marginals = pd.DataFrame({'probs': grouped.index.values,
+                              'total': grouped['size'].values,
+                              'trues': grouped['sum'].values.astype(np.int64)},
+                             columns=['probs', 'total', 'trues'])
+    marginals['marginal'] = marginals['trues'] / marginals['total'].astype(np.float64)
+    return marginals
+
+
+def calibration_curve(labels, predicted_probs, n_bins=10, strategy='uniform'):
+    """
+    Mean predicted probability against observed rate of the outcome, per bin
+    of predicted probability. Empty bins are left out.
+
+    Returns
+    ----------
+    pd.DataFrame with columns bin_start, bin_end, count, mean_predicted and observed
+
+    Parameters
+    ----------
+    labels : array
+        true labels, 1 for the positive class
+    predicted_probs : array
+        predicted probabilities of class 1
+    n_bins : int
+    strategy : str
+        'uniform' for equal width bins over [0, 1], 'quantile' for bins holding
+        roughly the same number of students
+    """
+    predicted_probs = np.asarray(predicted_probs, dtype=np.float64)
+    outcomes = (np.asarray(labels) == 1).astype(np.float64)
+    if strategy == 'uniform':
+        edges = np.linspace(0.0, 1.0, n_bins + 1)
+    elif strategy == 'quantile':
+        edges = np.unique(np.percentile(predicted_probs, np.linspace(0, 100, n_bins + 1)))
+        if len(edges) == 1:  # every probability is the same
+            edges = np.repeat(edges, 2)
+    else:
+        raise ValueError("strategy must be 'uniform' or 'quantile', not {}".format(strategy))
+
+    # the last bin is closed on the right, so a probability of 1 lands in it
+    bins = np.searchsorted(edges[1:-1], predicted_probs, side='right')
+    n = len(edges) - 1
+    counts = np.bincount(bins, minlength=n)
+    predicted_sums = np.bincount(bins, weights=predicted_probs, minlength=n)
+    outcome_sums = np.bincount(bins, weights=outcomes, minlength=n)
+
+    nonempty = counts > 0
+    return pd.DataFrame({'bin_start': edges[:-1][nonempty],
+                         'bin_end': edges[1:][nonempty],
+                         'count': counts[nonempty],
+                         'mean_predicted': predicted_sums[nonempty] / counts[nonempty],
+                         'observed': outcome_sums[nonempty] / counts[nonempty]},
+                        columns=['bin_start', 'bin_end', 'count', 'mean_predicted', 'observed'])
@@ -1,9 +1,16 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import datetime
-from sklearn.metrics import roc_curve, auc, precision_recall_curve
-from math import floor
+from workflow_metrics import roc_metrics
+from workflow_metrics import pr_metrics
+from workflow_metrics import compute_diagnostics
+from workflow_ranking import precision_at_cutoffs
+from workflow_calibration import marginal_precision
+from workflow_importance import forest_importance_stats
+from workflow_bootstrap import bootstrap_diagnostics
+from workflow_plotting import get_pyplot
+from workflow_plotting import draw_roc_curve
+from workflow_plotting import draw_precision_recall_curve
 
 
 # TODO: Have better documentation
@@ -14,23 +21,16 @@ def plot_roc_curve(test_outcomes, probs, clf_name, plot_curve=True, **kwargs):
     Plots FPR vs TPR
     Returns fpr, tpr, thresholds
     """
-    if type(probs) == np.array and probs.ndim == 2:
-        probs = [p[1] for p in probs]
+    if np.ndim(probs) == 2:
+        probs = np.asarray(probs)[:, 1]
 
-    fpr, tpr, thresholds = roc_curve(test_outcomes, probs, pos_label=1)
-    roc_auc = auc(fpr, tpr)
+    roc_auc, fpr, tpr, thresholds = roc_metrics(test_outcomes, probs)
 
     if plot_curve:
         # Plot ROC curve
+        plt = get_pyplot()
         plt.figure()
-        plt.plot(fpr, tpr, label='ROC curve (area = %0.3f)' % roc_auc, **kwargs)
-        plt.plot([0, 1], [0, 1], 'k--')  # random predictions curve
-        plt.xlim([0.0, 1.0])
-        plt.ylim([0.0, 1.0])
-        plt.xlabel('False Positive Rate or (1 - Specificity)')
-        plt.ylabel('True Positive Rate')
-        plt.title('ROC Curve - {}'.format(clf_name))
-        plt.legend(loc="best")
+        draw_roc_curve(plt, {'fpr': fpr, 'tpr': tpr, 'auc': roc_auc}, clf_name, **kwargs)
     return roc_auc, fpr, tpr, thresholds
 
 
@@ -41,75 +41,114 @@ def plot_precision_recall_curve(test_outcomes, probs, clf_name, plot_curve=True,
     Plots recall (x-axis) vs precision (y-axis)
     Returns precision, recall, thresholds
     """
-    if type(probs) == np.array and probs.ndim == 2:
-        probs = [p[1] for p in probs]
+    if np.ndim(probs) == 2:
+        probs = np.asarray(probs)[:, 1]
 
-    precision, recall, thresholds = precision_recall_curve(test_outcomes, probs)
-    pr_auc = auc(recall, precision)
+    pr_auc, precision, recall, thresholds = pr_metrics(test_outcomes, probs)
     if plot_curve:
+        plt = get_pyplot()
         plt.figure()
-        plt.plot(recall, precision, label='Precision-Recall Curve (area = {:.2f}'.format(pr_auc), **kwargs)
-        plt.xlim([0.0, 1.0])
-        plt.ylim([0.0, 1.0])
-        plt.xlabel('Recall')
-        plt.ylabel('Precision')
-        plt.title('Recall-Precision Curve - {}'.format(clf_name))
-        plt.legend(loc='best')
+        draw_precision_recall_curve(plt, {'precision': precision, 'recall': recall, 'auc': pr_auc},
+                                    clf_name, **kwargs)
     return pr_auc, precision, recall, thresholds
 
-def plot_feature_importance(fitted_model, feature_cols, plot_importances=True):
+def ranked_feature_report(feature_cols, importances, std):
+    """
+    Returns a string listing features from most to least important, with
+    their importance and standard deviation.
+    """
+    indices = np.argsort(importances)[::-1]
+    return ''.join(['{}. {} - ({:.3f}, std: {:.3f}) \n'.format(rank + 1,
+                                    feature_cols[ind],
+                                    importances[ind],
+                                    std[ind])
+                    for rank, ind in enumerate(indices)])
+
+
+def plot_feature_importance(fitted_model, feature_cols, plot_importances=True, show=True, n_jobs=1):
     """
     Plots feature importances and standard deviations for ensemble methods like
-    RF.
+    RF. The standard deviation across trees is accumulated one tree at a time,
+    split over n_jobs processes (see workflow_importance).
     Returns:
         importances: list
         std: list
     """
     importances = fitted_model.feature_importances_
-    std = np.std([tree.feature_importances_ for tree in fitted_model.estimators_],
-                 axis=0)
-    indices = np.argsort(importances)[::-1]
-    num_features = len(indices)
+    std = forest_importance_stats(fitted_model, n_jobs=n_jobs)[1]
 
-    l = []
-    for rank, ind in zip(np.arange(num_features), indices):
-        l.append('{}. {} - ({:.3f}, std: {:.3f}) \n'.format(rank + 1,
-                                    feature_cols[ind],
-                                    importances[ind],
-                                    std[ind]))
-        s = ''.join(l)
-
-    print s
+    print ranked_feature_report(feature_cols, importances, std)
 
     if plot_importances:
-        plt.figure()
-        plt.title("Feature importances")
-        plt.bar(range(num_features), importances[indices],
-            color="r", yerr=std[indices], align="center")
-        plt.xticks(range(num_features), np.array(feature_cols)[indices], rotation=270)
-        plt.xlim([-1, num_features])
-        plt.ylim([0, 0.5])
-        plt.show()
+        _draw_feature_importance(feature_cols, importances, std, show)
     return importances, std
 
 
-def plot_marginal_precision_curve(labels, predicted_probs, **kwargs):
-    """Returns marginals (% true / total students with that prob) and plots it
-    against predicted probabilities. A straight line is good."""
-    df = pd.DataFrame(data={'outcome': labels, 'probs': predicted_probs})
-    totals = [df[df['probs'] == p].shape[0] for p in predicted_probs]
-    trues = [df[df['probs'] == p]['outcome'].sum() for p in predicted_probs]
-    marginals = [float(true)/total for true, total in zip(trues, totals) if total != 0]
+def _draw_feature_importance(feature_cols, importances, std, show=True):
+    indices = np.argsort(importances)[::-1]
+    num_features = len(indices)
+    plt = get_pyplot()
+    plt.figure()
+    plt.title("Feature importances")
+    plt.bar(range(num_features), importances[indices],
+        color="r", yerr=std[indices], align="center")
+    plt.xticks(range(num_features), np.array(feature_cols)[indices], rotation=270)
+    plt.xlim([-1, num_features])
+    plt.ylim([0, 0.5])
+    if show:
+        plt.show()
+
+
+def plot_marginal_precision_curve(labels, predicted_probs, show=True, **kwargs):
+    """Returns marginals (% true / total students with that prob), one per
+    element of predicted_probs, and plots them against predicted probabilities.
+    A straight line is good. See workflow_calibration for the underlying numbers."""
+    per_prob = marginal_precision(labels, predicted_probs)
+    rates = pd.Series(per_prob['marginal'].values, index=per_prob['probs'].values)
+    marginals = list(rates.reindex(np.asarray(predicted_probs)).values)
+    plt = get_pyplot()
     plt.figure()
-    plt.plot(predicted_probs, marginals, **kwargs)
+    plt.plot(per_prob['probs'], per_prob['marginal'], **kwargs)
     plt.title('Marginal Precision Curve')
     plt.xlabel('Predicted Probs')
     plt.ylabel('Actual Proportions')
-    plt.show()
+    if show:
+        plt.show()
     return marginals
 
 
-def precision_at_top_x(fitted_clf, X_test, y_test, clf_name='', top_n=[], top_p=[], print_results=True):
+def score_in_batches(fitted_clf, X, batch_size=None):
+    """
+    Returns the predicted probability of class 1 for every row of X.
+    With batch_size, X is scored that many rows at a time so only one batch of
+    predict_proba output is held in memory at once.
+    """
+    if batch_size is None:
+        return fitted_clf.predict_proba(X)[:, 1]
+    predicted_probs = np.empty(X.shape[0])
+    for start in range(0, X.shape[0], batch_size):
+        predicted_probs[start:start + batch_size] = fitted_clf.predict_proba(X[start:start + batch_size])[:, 1]
+    return predicted_probs
+
+
+def _print_precision_at_top_x(clf_name, top_n, top_p, TopX_n, TopX_p):
+    print "Precision at Top X Results for " + clf_name
+    print "----------------"
+    TopX_n_df = pd.DataFrame(columns=[str(x) for x in top_n],
+                             index=['% Dropout'])
+    TopX_n_df.iloc[0] = TopX_n
+    print TopX_n_df
+    print '\n'
+    print "Precision at Top X% Results for " + clf_name
+    print "----------------"
+    TopX_p_df = pd.DataFrame(columns=[str(p) + '%' for p in top_p], index=['% Dropout:'])
+    TopX_p_df.iloc[0] = TopX_p
+    print TopX_p_df
+    print '\n'
+
+
+def precision_at_top_x(fitted_clf, X_test, y_test, clf_name='', top_n=[], top_p=[], print_results=True,
+                       predicted_probs=None):
     """
     Prints and returns precicion at Top X and Top X%, given a model, test data, and known outcomes
     fitted_clf is the classifier
@@ -118,54 +157,54 @@ def precision_at_top_x(fitted_clf, X_test, y_test, clf_name='', top_n=[], top_p=
     clf_name is a string describing the classifier
     top_n is a list of numbers for computing precision
     top_p is a list of percentiles
-
-    Dependencies: math.floor
+    predicted_probs are the class 1 probabilities for X_test, if already computed
     """
-    #Initialize ouptputs
-    TopX_n =[]
-    TopX_p =[]
-    #Compute predictions based on model
-    predicted_probs = fitted_clf.predict_proba(X_test)
-    predicted_probs = [p[1] for p in predicted_probs]
-
-    # Computing and print topX results
-    for n in top_n:
-	# .iloc is needed for proper indexing.
-        TopX_n.append((pd.Series(y_test).iloc[np.argsort(predicted_probs)[::-1][:n]].value_counts(normalize=True)[1]*100).round(2))
-
-    if all([i>0 and i<1 for i in top_p]): #if input as descimals, change to integers
-        top_p = top_p * 100
-
-    for p in top_p:
-        nrows = X_test.shape[0]
-        n = floor( (p/100.0) * nrows)
-        TopX_p.append((pd.Series(y_test).iloc[np.argsort(predicted_probs)[::-1][:n]].value_counts(normalize=True)[1]*100).round(2))
+    #Compute predictions based on model, unless given
+    if predicted_probs is None:
+        predicted_probs = score_in_batches(fitted_clf, X_test)
+
+    # Sorts once and reads every cutoff off the running count of positives
+    if len(top_p) > 0 and all([i>0 and i<1 for i in top_p]): #if input as descimals, change to integers
+        top_p = [p * 100 for p in top_p]
+    TopX_n, TopX_p = precision_at_cutoffs(y_test, predicted_probs, top_n=top_n, top_p=top_p)
 
     if print_results:
-        print "Precision at Top X Results for " + clf_name
-        print "----------------"
-        TopX_n_df = pd.DataFrame(columns=[str(x) for x in top_n],
-                                 index=['% Dropout'])
-        TopX_n_df.iloc[0] = TopX_n
-        print TopX_n_df
-        print '\n'
-        print "Precision at Top X% Results for " + clf_name
-        print "----------------"
-        TopX_p_df = pd.DataFrame(columns=[str(p) + '%' for p in top_p], index=['% Dropout:'])
-        TopX_p_df.iloc[0] = TopX_p
-        print TopX_p_df
-
-	print '\n'
+        _print_precision_at_top_x(clf_name, top_n, top_p, TopX_n, TopX_p)
 
     return (predicted_probs, TopX_n, TopX_p)
 
 def get_diagnostics_dict(fitted_clf, testing_data, feature_cols, outcome_col, clf_name,
                     get_feature_importances=True, print_importances=True, get_pr=True, plot_pr=True,
                     get_roc=True, plot_roc=True, get_precision_at_top_x=True,
-                    top_n=[30,50,100,200], top_p=[5,10,20,30,50], print_results=True):
+                    top_n=[30,50,100,200], top_p=[5,10,20,30,50], print_results=True,
+                    predicted_probs=None, batch_size=None, get_calibration=False,
+                    calibration_bins=10, calibration_strategy='uniform', n_bootstrap=0,
+                    bootstrap_seed=None, bootstrap_jobs=1, plot_importances=None):
+    """
+    Scores the test set once and computes every requested metric from the same
+    class 1 probabilities. Pass predicted_probs (e.g. from run_model) to skip
+    scoring altogether, or batch_size to score a large test set in batches.
+    get_calibration adds the binned calibration curve (see
+    workflow_calibration.calibration_curve). n_bootstrap > 0 adds 95% bootstrap
+    intervals under '<metric> CI' keys (see workflow_bootstrap).
+
+    Feature importances are only available for ensembles of trees (models with
+    estimators_); for other models a note is printed and 'ranked features' is
+    left out. plot_importances draws them as a bar chart, and defaults to
+    print_importances.
+
+    With plot_pr, plot_roc and plot_importances off, matplotlib is never
+    imported. Batch jobs can also call workflow_metrics.compute_diagnostics
+    directly and write figures with workflow_plotting.render_diagnostics.
+    """
     results_dict = dict()
-    X_test, y_test = testing_data[feature_cols].values, testing_data[outcome_col].values
-    predicted_probs = fitted_clf.predict_proba(X_test)
+    y_test = testing_data[outcome_col].values
+    X_test = None
+    if predicted_probs is None:
+        X_test = testing_data[feature_cols].values
+        predicted_probs = score_in_batches(fitted_clf, X_test, batch_size)
+    elif np.ndim(predicted_probs) == 2:
+        predicted_probs = np.asarray(predicted_probs)[:, 1]
     now = datetime.datetime.now()
     results_dict['outcome'] = outcome_col
     results_dict['number of rows tested on'] = testing_data.shape[0]
@@ -173,36 +212,55 @@ def get_diagnostics_dict(fitted_clf, testing_data, feature_cols, outcome_col, cl
     results_dict['model name'] = clf_name
     results_dict['timestamp'] = now.__str__()
 
-    if get_precision_at_top_x:
-        pred_probs, TopX_n, TopX_p = precision_at_top_x(fitted_clf, X_test, y_test, clf_name,
-                                                    top_n = top_n, top_p = top_p,
-                                                        print_results = print_results)
-
-        results_dict['top x students'] = top_n
-        results_dict['top p% students'] = top_p
-        results_dict['% outcome on top x students'] = TopX_n
-        results_dict['% outcome on top p% students'] = TopX_p
-
-    if get_pr:
-        pr_auc, precision, recall, pr_thresholds = plot_precision_recall_curve(y_test,
-                                                                              predicted_probs,
-                                                                              clf_name,
-                                                                              plot_pr)
-        results_dict['PR AUC'] = round(pr_auc, 3)
-
-    if get_roc:
-        roc_auc, tpr, fpr, roc_thresholds = plot_roc_curve(y_test,
-                                                          predicted_probs,
-                                                          clf_name, plot_roc)
-        results_dict['ROC AUC'] = round(roc_auc, 3)
-
-    if get_feature_importances:
-        feature_cols, importances, indices, std, s = plot_feature_importance(fitted_clf, feature_cols, print_importances)
+    summary, curves = compute_diagnostics(y_test, predicted_probs, get_pr=get_pr, get_roc=get_roc,
+                                          get_precision_at_top_x=get_precision_at_top_x,
+                                          top_n=top_n, top_p=top_p,
+                                          get_calibration=get_calibration,
+                                          calibration_bins=calibration_bins,
+                                          calibration_strategy=calibration_strategy)
+    results_dict.update(summary)
+
+    if n_bootstrap > 0:
+        intervals = bootstrap_diagnostics(y_test, predicted_probs, n_resamples=n_bootstrap,
+                                          top_n=top_n, top_p=summary.get('top p% students', top_p),
+                                          seed=bootstrap_seed, n_jobs=bootstrap_jobs)
+        for key, interval in intervals.items():
+            if key in summary:
+                results_dict[key + ' CI'] = interval
+
+    if get_precision_at_top_x and print_results:
+        _print_precision_at_top_x(clf_name, top_n, summary['top p% students'],
+                                  summary['% outcome on top x students'],
+                                  summary['% outcome on top p% students'])
+
+    # matplotlib is only imported if something is actually plotted
+    if get_pr and plot_pr:
+        plt = get_pyplot()
+        plt.figure()
+        draw_precision_recall_curve(plt, curves['pr'], clf_name)
+
+    if get_roc and plot_roc:
+        plt = get_pyplot()
+        plt.figure()
+        draw_roc_curve(plt, curves['roc'], clf_name)
+
+    if get_feature_importances and hasattr(fitted_clf, 'estimators_'):
+        importances = fitted_clf.feature_importances_
+        std = forest_importance_stats(fitted_clf)[1]
+        s = ranked_feature_report(feature_cols, importances, std)
         results_dict['ranked features'] = s
 
-    if print_importances:
-        print("Feature Importances:")
-        print '----------'
-        print s
+        if print_importances:
+            print("Feature Importances:")
+            print '----------'
+            print s
+
+        if plot_importances is None:
+            plot_importances = print_importances
+        if plot_importances:
+            _draw_feature_importance(feature_cols, importances, std)
+    elif get_feature_importances:
+        print 'Skipping feature importances for {}: {} has no estimators_'.format(
+            clf_name, type(fitted_clf).__name__)
 
     return results_dict
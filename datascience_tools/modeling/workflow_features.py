@@ -0,0 +1,89 @@
+from sklearn import preprocessing
+from collections import OrderedDict
+from collections import namedtuple
+import numpy as np
+
+# X_train and X_test are read-only float arrays; scaler is the StandardScaler fit
+# on X_train (None if not normalized).
+FeatureMatrices = namedtuple('FeatureMatrices', ['X_train', 'X_test', 'scaler'])
+
+
+class FeatureMatrixCache(object):
+    """
+    Caches the float matrices extracted from a train/test split, keyed by
+    (dataset id, feature list, normalization), so models that share a feature
+    set reuse the same arrays instead of re-extracting and re-scaling them.
+
+    The cached arrays are marked read-only since they are shared; copy them
+    before modifying. The frames are not copied: a frame must not be modified
+    while matrices built from it are cached, or later calls get the matrices
+    of the old values. Call clear after modifying one.
+
+    Parameters
+    ----------
+    max_entries : int
+        number of matrix sets kept; the least recently used is dropped beyond
+        it, along with the frames it holds on to (see get). None keeps every
+        set, so only share an unbounded cache across calls that pass a
+        dataset_id.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._matrices = OrderedDict()
+
+    def get(self, training, testing, features, normalize=True, dataset_id=None):
+        """
+        Returns
+        ----------
+        FeatureMatrices
+
+        Parameters
+        ----------
+        training : pd.DataFrame
+        testing : pd.DataFrame
+        features : list
+            feature columns, in order
+        normalize : bool
+            standardize both matrices with a scaler fit on the training data
+        dataset_id : hashable
+            identifies the train/test split. Defaults to the identity of the
+            two frames, which are then kept alive until the entry is dropped
+            so their ids can't be reused. Pass something stable (e.g.
+            'cohort_2012') when the cache is shared across calls, and if the
+            same data is reloaded into new frames.
+        """
+        frames = None
+        if dataset_id is None:
+            dataset_id = (id(training), id(testing))
+            frames = (training, testing)
+        key = (dataset_id, tuple(features), normalize)
+        if key in self._matrices:
+            entry = self._matrices.pop(key)
+        else:
+            entry = (self._extract(training, testing, features, normalize), frames)
+        self._matrices[key] = entry  # most recently used last
+        if self.max_entries is not None:
+            while len(self._matrices) > self.max_entries:
+                self._matrices.popitem(last=False)
+        return entry[0]
+
+    @staticmethod
+    def _extract(training, testing, features, normalize):
+        # np.array copies, so the arrays never alias the frames' own data
+        X_train = np.array(training[features].values, dtype=np.float64)
+        X_test = np.array(testing[features].values, dtype=np.float64)
+        scaler = None
+        if normalize:
+            scaler = preprocessing.StandardScaler(copy=False).fit(X_train)
+            X_train = scaler.transform(X_train)
+            X_test = scaler.transform(X_test)
+        X_train.flags.writeable = False
+        X_test.flags.writeable = False
+        return FeatureMatrices(X_train, X_test, scaler)
+
+    def clear(self):
+        self._matrices.clear()
+
+    def __len__(self):
+        return len(self._matrices)
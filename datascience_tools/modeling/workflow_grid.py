@@ -0,0 +1,107 @@
+from workflow_metrics import compute_diagnostics
+from workflow_features import FeatureMatrixCache
+from sklearn.base import clone
+from collections import namedtuple
+import multiprocessing
+import traceback
+import pandas as pd
+import time
+
+# One configuration of a grid: clf is an unfitted classifier, params are set on a
+# clone of it with set_params, and features is the list of feature columns to use.
+ModelSpec = namedtuple('ModelSpec', ['clf_name', 'clf', 'params', 'features'])
+
+# Feature matrices and outcomes shared with the worker processes. They are set
+# before the pool forks, so workers read them without pickling.
+_shared = {}
+
+
+def _run_spec(spec):
+    result = {'model name': spec.clf_name,
+              'params': spec.params,
+              'number of features': len(spec.features)}
+    start_time = time.time()
+    try:
+        X_train, X_test = _shared['matrices'][tuple(spec.features)]
+        clf = clone(spec.clf).set_params(**spec.params)
+        fitted_clf = clf.fit(X_train, _shared['y_train'])
+        predicted_probs = fitted_clf.predict_proba(X_test)[:, 1]
+        summary, curves = compute_diagnostics(_shared['y_test'], predicted_probs,
+                                              **_shared['diagnostics_kwargs'])
+        result.update(summary)
+        result['error'] = None
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.time() - start_time
+    return result
+
+
+def run_model_grid(training, testing, specs, outcome, normalize=True, n_workers=None,
+                   verbose=True, feature_cache=None, dataset_id=None, **diagnostics_kwargs):
+    """
+    Trains and evaluates every ModelSpec in specs on a process pool, without
+    importing matplotlib. Feature matrices are built once per distinct feature
+    set and shared by all the specs that use it. A spec that raises doesn't
+    stop the others; its traceback is in the 'error' column.
+
+    Returns
+    ----------
+    pd.DataFrame with one row per spec, in the order given
+
+    Parameters
+    ----------
+    training : pd.DataFrame
+    testing : pd.DataFrame
+    specs : list of ModelSpec
+    outcome : str
+        outcome column
+    normalize : bool
+        standardize features with a scaler fit on the training data
+    n_workers : int
+        number of processes. Defaults to the number of cpus; 1 runs serially.
+    verbose : bool
+    feature_cache : FeatureMatrixCache
+        reuse matrices already built for this dataset, e.g. across grids
+    dataset_id : hashable
+        passed on to FeatureMatrixCache.get
+    diagnostics_kwargs :
+        passed on to workflow_metrics.compute_diagnostics, e.g. top_n, top_p
+    """
+    if feature_cache is None:
+        feature_cache = FeatureMatrixCache()
+    matrices = {}
+    for spec in specs:
+        cached = feature_cache.get(training, testing, spec.features, normalize=normalize,
+                                   dataset_id=dataset_id)
+        matrices[tuple(spec.features)] = (cached.X_train, cached.X_test)
+    _shared['matrices'] = matrices
+    _shared['y_train'] = training[outcome].values
+    _shared['y_test'] = testing[outcome].values
+    _shared['diagnostics_kwargs'] = diagnostics_kwargs
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+
+    if verbose:
+        print 'Running {} models on {} workers'.format(len(specs), n_workers)
+    start_time = time.time()
+    try:
+        if n_workers <= 1:
+            results = map(_run_spec, specs)
+        else:
+            pool = multiprocessing.Pool(n_workers)
+            try:
+                results = pool.map(_run_spec, specs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _shared.clear()
+
+    leading = ['model name', 'params', 'number of features']
+    trailing = ['seconds', 'error']
+    metrics = sorted(set().union(*[result.keys() for result in results]) - set(leading + trailing))
+    results_df = pd.DataFrame(results, columns=leading + metrics + trailing)
+    if verbose:
+        n_failed = results_df['error'].notnull().sum()
+        print 'Finished in {:.1f} seconds, {} failed'.format(time.time() - start_time, n_failed)
+    return results_df
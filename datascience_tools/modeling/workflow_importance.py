@@ -0,0 +1,164 @@
+from sklearn.metrics import roc_auc_score
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+# Fitted model and data shared with forked worker processes, so they aren't pickled per task
+_shared = {}
+
+
+class WelfordAccumulator(object):
+    """
+    Streaming mean and standard deviation of equal-length vectors, using
+    Welford's algorithm, so the vectors never have to be held in memory at once.
+    Accumulators built on separate chunks can be merged.
+    """
+
+    def __init__(self, n_features):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)  # sum of squared differences from the mean
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """
+        Combines other into this accumulator (Chan et al.'s parallel update).
+        """
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / float(count)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / float(count)
+        self.count = count
+        return self
+
+    @property
+    def std(self):
+        """Population standard deviation, like np.std."""
+        if self.count == 0:
+            return np.full(self.mean.shape, np.nan)
+        return np.sqrt(self.m2 / self.count)
+
+
+def _accumulate_trees(bounds):
+    start, stop = bounds
+    estimators = _shared['estimators']
+    accumulator = WelfordAccumulator(_shared['n_features'])
+    for tree in estimators[start:stop]:
+        accumulator.update(tree.feature_importances_)
+    return accumulator
+
+
+def _run_on_pool(func, tasks, n_jobs):
+    if n_jobs <= 1:
+        return map(func, tasks)
+    pool = multiprocessing.Pool(n_jobs)
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def forest_importance_stats(fitted_model, n_jobs=1):
+    """
+    Returns
+    ----------
+    (mean, std) of the feature importances of the trees in an ensemble,
+    accumulated one tree at a time
+
+    Parameters
+    ----------
+    fitted_model : fitted ensemble with estimators_, e.g. RandomForestClassifier
+    n_jobs : int
+        number of processes to split the trees over
+    """
+    estimators = np.ravel(fitted_model.estimators_)  # boosting stores a 2-d array of trees
+    n_features = len(fitted_model.feature_importances_)
+    n_jobs = max(1, min(n_jobs, len(estimators)))
+    edges = np.linspace(0, len(estimators), n_jobs + 1).astype(int)
+
+    _shared['estimators'] = estimators
+    _shared['n_features'] = n_features
+    try:
+        accumulators = _run_on_pool(_accumulate_trees, zip(edges[:-1], edges[1:]), n_jobs)
+    finally:
+        _shared.clear()
+
+    total = WelfordAccumulator(n_features)
+    for accumulator in accumulators:
+        total.merge(accumulator)
+    return total.mean, total.std
+
+
+def _score_permutations(tasks):
+    fitted_clf, X, y = _shared['clf'], _shared['X'], _shared['y']
+    metric, baseline = _shared['metric'], _shared['baseline']
+    X_permuted = np.array(X, copy=True)  # one working copy per batch, restored column by column
+    drops = []
+    for feature, seed in tasks:
+        original = X_permuted[:, feature].copy()
+        X_permuted[:, feature] = np.random.RandomState(seed).permutation(original)
+        drops.append((feature, baseline - metric(y, fitted_clf.predict_proba(X_permuted)[:, 1])))
+        X_permuted[:, feature] = original
+    return drops
+
+
+def permutation_importance(fitted_clf, X, y, feature_cols, metric=roc_auc_score, n_repeats=5,
+                           batch_size=10, n_jobs=1, seed=None):
+    """
+    Drop in the metric when each feature's column is shuffled, averaged over
+    n_repeats shuffles. (feature, repeat) pairs are scored in batches of
+    batch_size on a pool of n_jobs processes.
+
+    Returns
+    ----------
+    pd.DataFrame with columns feature, importance and std, sorted by importance
+
+    Parameters
+    ----------
+    fitted_clf : fitted classifier with predict_proba
+    X : array
+        test feature matrix
+    y : array
+        test outcomes
+    feature_cols : list
+        names of the columns of X
+    metric : function
+        metric(y_true, class 1 probabilities), higher is better
+    n_repeats : int
+    batch_size : int
+        number of shuffles each task scores
+    n_jobs : int
+    seed : int
+    """
+    X = np.asarray(X)
+    seeds = np.random.RandomState(seed).randint(0, 2**31 - 1, size=(X.shape[1], n_repeats))
+    tasks = [(feature, seeds[feature, repeat])
+             for feature in range(X.shape[1]) for repeat in range(n_repeats)]
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+
+    _shared.update(clf=fitted_clf, X=X, y=y, metric=metric,
+                   baseline=metric(y, fitted_clf.predict_proba(X)[:, 1]))
+    try:
+        results = _run_on_pool(_score_permutations, batches, n_jobs)
+    finally:
+        _shared.clear()
+
+    drops = np.zeros((X.shape[1], n_repeats))
+    filled = np.zeros(X.shape[1], dtype=int)
+    for batch in results:
+        for feature, drop in batch:
+            drops[feature, filled[feature]] = drop
+            filled[feature] += 1
+    importances = pd.DataFrame({'feature': feature_cols,
+                                'importance': drops.mean(axis=1),
+                                'std': drops.std(axis=1)},
+                               columns=['feature', 'importance', 'std'])
+    return importances.sort_values('importance', ascending=False).reset_index(drop=True)
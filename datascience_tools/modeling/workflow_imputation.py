@@ -0,0 +1,256 @@
+from random_util import make_rng
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
+from pandas.api.types import is_numeric_dtype
+
+_LIST_TYPES = (list, tuple, np.ndarray)
+
+
+def _observed_values(s):
+    """
+    Non-null values of s, with list-wrapped cells (some values are packed as a
+    list) replaced by their first element.
+    """
+    values = s.dropna()
+    if values.dtype == object:
+        packed = values.map(type).isin(_LIST_TYPES)
+        if packed.any():
+            values = values.copy()
+            values[packed] = values[packed].str[0]
+            values = values.dropna()
+    return values
+
+
+def _numeric_modes(values):
+    """
+    Most common non-null value of every column of a 2-d float array, the
+    smallest one on ties (like Series.mode().iloc[0]), NaN for an all-null
+    column. All columns are sorted at once and their runs counted together.
+    """
+    n_rows, n_cols = values.shape
+    # column by column, NaNs last; sorting rows of the transpose keeps memory access contiguous
+    flat = np.sort(np.ascontiguousarray(values.T), axis=1).ravel()
+    col_ids = np.repeat(np.arange(n_cols), n_rows)
+    starts = np.flatnonzero(np.r_[True, (flat[1:] != flat[:-1]) | (col_ids[1:] != col_ids[:-1])])
+    lengths = np.diff(np.r_[starts, len(flat)])
+    lengths[np.isnan(flat[starts])] = 0  # NaN != NaN, so each null is its own run
+    run_cols = col_ids[starts]
+    first_run = np.searchsorted(run_cols, np.arange(n_cols))
+    longest = np.maximum.reduceat(lengths, first_run)
+    is_mode = lengths == longest[run_cols]
+    # runs are in ascending order within a column, so the first longest is the smallest value
+    mode_cols = run_cols[is_mode]
+    mode_runs = starts[is_mode][np.r_[True, mode_cols[1:] != mode_cols[:-1]]]
+    return flat[mode_runs]
+
+
+def _mode_values(s):
+    # categoricals are reduced over their codes, with -1 (missing) as NaN
+    if is_categorical_dtype(s.dtype):
+        codes = s.cat.codes.values.astype(np.float64)
+        codes[codes < 0] = np.nan
+        return codes
+    return s.astype(np.float64).values
+
+
+def column_modes(data):
+    """
+    Returns a Series with the mode of every column of data. Numeric columns
+    (nullable integers included) and categoricals, by their codes, are
+    reduced together in one pass; other columns fall back to value_counts.
+    """
+    reducible = [col for col, dtype in data.dtypes.iteritems()
+                 if is_numeric_dtype(dtype) or is_categorical_dtype(dtype)]
+    modes = {}
+    if reducible and len(data) > 0:
+        block = np.column_stack([_mode_values(data[col]) for col in reducible])
+        for col, mode in zip(reducible, _numeric_modes(block)):
+            if is_categorical_dtype(data[col].dtype):
+                mode = np.nan if np.isnan(mode) else data[col].cat.categories[int(mode)]
+            modes[col] = mode
+    for col in data.columns.difference(reducible):
+        counts = data[col].value_counts()
+        modes[col] = counts.index[counts.values == counts.values[0]].min() if len(counts) else np.nan
+    return pd.Series(modes).reindex(data.columns)
+
+
+def _float_columns(data, columns):
+    """
+    data[columns] with nullable integer columns as float64, for statistics
+    pandas can't reduce over extension arrays.
+    """
+    frame = data[columns]
+    extension = dict((col, np.float64) for col, dtype in frame.dtypes.iteritems()
+                     if is_numeric_dtype(dtype) and not isinstance(dtype, np.dtype))
+    return frame.astype(extension) if extension else frame
+
+
+def _fill_column(s, value):
+    """
+    Returns s with its missing values set to value, for columns the masked
+    float fill in Imputer.transform doesn't cover.
+    """
+    if is_categorical_dtype(s.dtype):
+        if value not in s.cat.categories:
+            s = s.cat.add_categories([value])
+        return s.fillna(value)
+    if not isinstance(s.dtype, np.dtype) and is_numeric_dtype(s.dtype):  # nullable integers
+        if float(value) != int(value):
+            return s.astype(np.float64).fillna(value)  # e.g. the mean of a 0/1 flag
+        value = int(value)
+    return s.fillna(value)
+
+
+class EmpiricalImputer(object):
+    """
+    Replaces missing values with random draws from each column's observed
+    (empirical) distribution.
+
+    fit stores every column's distribution as arrays of distinct values and
+    their counts. transform samples all the missing cells of a column in one
+    draw, so a test set can be imputed from the training distributions
+    without refitting.
+
+    Parameters
+    ----------
+    seed : int
+        seeds the imputer's own random generator; the global numpy RNG is left alone
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self._rng = make_rng(seed)
+        self.distributions_ = {}
+
+    def fit(self, data, columns):
+        """
+        Parameters
+        ----------
+        data : pd.DataFrame
+        columns : list
+            columns to fit distributions for
+        """
+        distributions = {}
+        for col in columns:
+            # by value, so a seed draws the same values whether or not the column is categorical
+            counts = _observed_values(data[col]).value_counts(sort=False).sort_index()
+            distributions[col] = (counts.index.values, counts.values)
+        self.distributions_ = distributions
+        return self
+
+    def transform(self, data, copy=True):
+        """
+        Returns data with the missing values of every fitted column imputed.
+        With copy=False, data is modified in place.
+        """
+        if copy:
+            data = data.copy()
+        for col, (values, counts) in self.distributions_.items():
+            missing = data[col].isnull().values
+            n_missing = missing.sum()
+            if n_missing == 0:
+                continue
+            if len(values) == 0:
+                raise ValueError('column {!r} had no observed values to impute from'.format(col))
+            draws = self._rng.choice(len(values), size=n_missing,
+                                     p=counts / float(counts.sum()))
+            if not isinstance(data[col].dtype, np.dtype):  # categorical and nullable integers
+                data[col] = data[col].fillna(pd.Series(values[draws], index=data.index[missing]))
+                continue
+            filled = data[col].values.copy()
+            if filled.dtype != values.dtype and not np.can_cast(values.dtype, filled.dtype):
+                filled = filled.astype(object)
+            filled[missing] = values[draws]
+            data[col] = filled
+        return data
+
+    def fit_transform(self, data, columns, copy=True):
+        return self.fit(data, columns).transform(data, copy=copy)
+
+
+class Imputer(object):
+    """
+    Fills missing values with column statistics and empirical draws.
+
+    fit computes each strategy's statistics for all of its columns in one
+    reduction. transform fills the statistic-imputed float columns of each
+    dtype in one masked assignment, and categorical, nullable integer and
+    string columns one at a time. The fitted imputer can be saved and
+    reloaded, so a test set or a later cohort is imputed with the training
+    statistics.
+
+    Parameters
+    ----------
+    empirical_columns : list
+        columns filled with draws from their observed values (see EmpiricalImputer)
+    mean_columns : list
+    median_columns : list
+    mode_columns : list
+    seed : int
+        seeds the empirical draws
+    """
+
+    def __init__(self, empirical_columns=[], mean_columns=[], median_columns=[],
+                 mode_columns=[], seed=None):
+        self.empirical_columns = list(empirical_columns)
+        self.mean_columns = list(mean_columns)
+        self.median_columns = list(median_columns)
+        self.mode_columns = list(mode_columns)
+        self.empirical_imputer_ = EmpiricalImputer(seed=seed)
+        self.statistics_ = {}
+
+    def fit(self, data):
+        statistics = {}
+        if self.mean_columns:
+            statistics.update(_float_columns(data, self.mean_columns).mean().to_dict())
+        if self.median_columns:
+            statistics.update(_float_columns(data, self.median_columns).median().to_dict())
+        if self.mode_columns:
+            statistics.update(column_modes(data[self.mode_columns]).to_dict())
+        self.statistics_ = statistics
+        self.empirical_imputer_.fit(data, self.empirical_columns)
+        return self
+
+    def transform(self, data, inplace=False):
+        """
+        Returns data with missing values imputed. With inplace=True, data is
+        modified and returned rather than copied.
+        """
+        if not inplace:
+            data = data.copy()
+        if self.statistics_:
+            fill_values = pd.Series(self.statistics_).reindex(data.columns)
+            to_fill = data.columns[fill_values.notnull().values & data.isnull().any().values]
+            floats = {}
+            for col in to_fill:
+                dtype = data[col].dtype
+                if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+                    floats.setdefault(dtype, []).append(col)
+                else:
+                    data[col] = _fill_column(data[col], fill_values[col])
+            for dtype, cols in floats.items():
+                # one masked pass over each float block, keeping its dtype
+                block = data[cols].values
+                filled = np.where(np.isnan(block), fill_values[cols].values.astype(dtype), block)
+                for i, col in enumerate(cols):  # assigning cols at once upcasts mixed frames
+                    data[col] = filled[:, i]
+        return self.empirical_imputer_.transform(data, copy=False)
+
+    def fit_transform(self, data, inplace=False):
+        return self.fit(data).transform(data, inplace=inplace)
+
+    def save(self, path):
+        """Pickles the fitted imputer to path."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """Returns an imputer saved with save."""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
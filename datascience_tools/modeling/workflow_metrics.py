@@ -0,0 +1,80 @@
+from sklearn.metrics import roc_curve, auc, precision_recall_curve
+from workflow_ranking import precision_at_cutoffs
+from workflow_calibration import calibration_curve
+import numpy as np
+
+# Compute-only diagnostics. Nothing here imports matplotlib, so batch jobs on
+# headless workers can use it without paying for (or choking on) a display
+# backend. Plotting lives in workflow_plotting.
+
+
+def roc_metrics(test_outcomes, probs):
+    """
+    Returns roc_auc, fpr, tpr, thresholds
+    """
+    fpr, tpr, thresholds = roc_curve(test_outcomes, probs, pos_label=1)
+    return auc(fpr, tpr), fpr, tpr, thresholds
+
+
+def pr_metrics(test_outcomes, probs):
+    """
+    Returns pr_auc, precision, recall, thresholds
+    """
+    precision, recall, thresholds = precision_recall_curve(test_outcomes, probs)
+    return auc(recall, precision), precision, recall, thresholds
+
+
+def compute_diagnostics(y_test, predicted_probs, get_pr=True, get_roc=True,
+                        get_precision_at_top_x=True, top_n=[30,50,100,200], top_p=[5,10,20,30,50],
+                        get_calibration=False, calibration_bins=10, calibration_strategy='uniform'):
+    """
+    Computes every requested metric from one vector of class 1 probabilities.
+
+    Returns
+    ----------
+    (summary, curves)
+    summary : dict
+        the metrics get_diagnostics_dict reports, under the same keys
+    curves : dict
+        the arrays behind them, for plotting: 'roc' (fpr, tpr, thresholds),
+        'pr' (precision, recall, thresholds) and 'calibration' (a DataFrame)
+
+    Parameters
+    ----------
+    y_test : array
+        true labels
+    predicted_probs : array
+        predicted probabilities of class 1 (a 2-d predict_proba output is accepted too)
+    """
+    if np.ndim(predicted_probs) == 2:
+        predicted_probs = np.asarray(predicted_probs)[:, 1]
+    summary, curves = {}, {}
+
+    if get_precision_at_top_x:
+        if len(top_p) > 0 and all([0 < p < 1 for p in top_p]):  # fractions, change to percentages
+            top_p = [p * 100 for p in top_p]
+        TopX_n, TopX_p = precision_at_cutoffs(y_test, predicted_probs, top_n=top_n, top_p=top_p)
+        summary['top x students'] = top_n
+        summary['top p% students'] = top_p
+        summary['% outcome on top x students'] = TopX_n
+        summary['% outcome on top p% students'] = TopX_p
+
+    if get_pr:
+        pr_auc, precision, recall, thresholds = pr_metrics(y_test, predicted_probs)
+        summary['PR AUC'] = round(pr_auc, 3)
+        curves['pr'] = {'precision': precision, 'recall': recall, 'thresholds': thresholds,
+                        'auc': pr_auc}
+
+    if get_roc:
+        roc_auc, fpr, tpr, thresholds = roc_metrics(y_test, predicted_probs)
+        summary['ROC AUC'] = round(roc_auc, 3)
+        curves['roc'] = {'fpr': fpr, 'tpr': tpr, 'thresholds': thresholds, 'auc': roc_auc}
+
+    if get_calibration:
+        curve = calibration_curve(y_test, predicted_probs, n_bins=calibration_bins,
+                                  strategy=calibration_strategy)
+        summary['calibration mean predicted'] = list(curve['mean_predicted'].round(3))
+        summary['calibration observed'] = list(curve['observed'].round(3))
+        curves['calibration'] = curve
+
+    return summary, curves
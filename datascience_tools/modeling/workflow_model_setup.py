@@ -1,13 +1,13 @@
 from workflow_diagnostics import get_diagnostics_dict
-from workflow_util import upload_to_s3
-from sklearn import preprocessing
-import cPickle as pickle
-import pandas as pd
-import os
+from workflow_util import pickle_to_s3
+from workflow_features import FeatureMatrixCache
+from workflow_results import ResultsStore
 
 def run_model(training, testing, features, outcome, clf,
-		clf_name, normalize=True, verbose=True):
+		clf_name, normalize=True, verbose=True, feature_cache=None, dataset_id=None):
     # NOTE: You should set the clf seed ahead of time
+    # Pass the same FeatureMatrixCache and dataset_id to calls that share a
+    # dataset so the feature matrices and scaler are only built once.
 
     if verbose:
         print 'Starting training of: {}'.format(clf_name)
@@ -18,11 +18,12 @@ def run_model(training, testing, features, outcome, clf,
         print 'Outcome: {}'.format(outcome)
 
 
-    X_train, y_train = training[features].values, training[outcome].values
-    X_test = testing[features].values
-    if normalize:
-        X_train = preprocessing.StandardScaler().fit(X_train).transform(X_train)
-        X_test = preprocessing.StandardScaler().fit(X_test).transform(X_test)
+    if feature_cache is None:
+        feature_cache = FeatureMatrixCache()
+    # the test set is scaled with the scaler fit on the training set
+    X_train, X_test, scaler = feature_cache.get(training, testing, features,
+                                                normalize=normalize, dataset_id=dataset_id)
+    y_train = training[outcome].values
 
     fitted_clf = clf.fit(X_train, y_train)
 
@@ -39,23 +40,21 @@ def run_model(training, testing, features, outcome, clf,
     return fitted_clf, predicted_probabilities
 
 def run_and_output_model_to_s3(training, testing, features, outcome, clf, clf_name, s3_path,
-			       verbose=True, **kwargs):
+			       verbose=True, compression=None, results_store=None, **kwargs):
+    # Diagnostics are appended to results_store (a workflow_results.ResultsStore,
+    # by default ../results/results.db), which is safe to share between parallel runs.
 
     fitted_clf, predicted_probs = run_model(training, testing, features, outcome, clf,
-					    clf_name, verbose)
-    #Pickling happens here
-    os.mkdir('../results/temp/')
-    filepath = os.path.join('../results/temp', clf_name + '.pkl')
-    pickle.dump(fitted_clf, open(filepath, 'wb'))
+					    clf_name, verbose=verbose)
+    #Pickling happens here, in memory
     print 'Uploading to S3 at {}'.format(s3_path)
-    upload_to_s3('../results/temp', clf_name + '.pkl', s3_path = s3_path)
-    print 'Done uploading {} to s3 \n'.format(filepath)
-    os.remove(filepath)
-    os.rmdir('../results/temp/')
-
-    # Putting the diagnostics dict into a dataframe and saving to results folder
-    diagnostics_dict = get_diagnostics_dict(fitted_clf, testing, features, outcome, clf_name, **kwargs)
-    results_df = pd.read_csv('../results/results.csv')
-    results_df = results_df.append([diagnostics_dict])
-    results_df.to_csv(path_or_buf='../results/results.csv', index=False)
+    pickle_to_s3(fitted_clf, clf_name + '.pkl', s3_path=s3_path, compression=compression)
+    print 'Done uploading {} to s3 \n'.format(clf_name + '.pkl')
+
+    # Appending the diagnostics dict to the results store
+    diagnostics_dict = get_diagnostics_dict(fitted_clf, testing, features, outcome, clf_name,
+                                            predicted_probs=predicted_probs, **kwargs)
+    if results_store is None:
+        results_store = ResultsStore()
+    results_store.append(diagnostics_dict)
     return diagnostics_dict
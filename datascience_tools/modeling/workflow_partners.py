@@ -0,0 +1,112 @@
+import importlib
+
+
+class RenameMap(object):
+    """
+    Memoized column renaming for one cohort. make_dict(column_names) is the
+    partner's rename function; it's only called for columns this map hasn't
+    seen, so renaming another frame of the same cohort is a dict lookup per column.
+    """
+
+    def __init__(self, make_dict):
+        self.make_dict = make_dict
+        self.names = {}
+
+    def mapping(self, cols):
+        unseen = [col for col in cols if col not in self.names]
+        if unseen:
+            new_names = self.make_dict(unseen)
+            self.names.update((col, new_names.get(col, col)) for col in unseen)
+        return dict((col, self.names[col]) for col in cols)
+
+
+class PartnerAdapter(object):
+    """
+    Partner-specific preprocessing, looked up by partner name.
+
+    The partner's module is only imported the first time one of its
+    functions is needed, so registering a district costs the others nothing.
+
+    Parameters
+    ----------
+    name : str
+        name we use internally for the partner, e.g. 'cabarrus'
+    module_name : str
+        module with the partner's functions, or None if there is none yet
+    rename_function : str
+        name of the module's function returning a rename dict, called as
+        f(column_names=..., cohort_graduating_year=..., earliest_grade=...)
+    cohort_function : str
+        name of the module's function selecting the students to model, called
+        as f(data, model_grade)
+    """
+
+    def __init__(self, name, module_name=None, rename_function=None, cohort_function=None):
+        self.name = name
+        self.module_name = module_name
+        self.rename_function = rename_function
+        self.cohort_function = cohort_function
+        self._module = None
+        self._rename_maps = {}
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = _import_partner_module(self.module_name)
+        return self._module
+
+    def rename_map(self, cohort_graduating_year, earliest_grade):
+        """
+        Returns the RenameMap for a cohort, built once per
+        (graduating year, earliest grade).
+        """
+        key = (cohort_graduating_year, earliest_grade)
+        if key not in self._rename_maps:
+            if self.rename_function is None:
+                make_dict = lambda cols: {}
+            else:
+                rename = getattr(self.module, self.rename_function)
+                make_dict = lambda cols: rename(column_names=cols,
+                                                cohort_graduating_year=cohort_graduating_year,
+                                                earliest_grade=earliest_grade)
+            self._rename_maps[key] = RenameMap(make_dict)
+        return self._rename_maps[key]
+
+    def select_cohort(self, data, model_grade):
+        if self.cohort_function is None:
+            return data
+        return getattr(self.module, self.cohort_function)(data, model_grade)
+
+
+def _import_partner_module(module_name):
+    # partner modules sit next to this one, or anywhere importable
+    if __package__:
+        try:
+            return importlib.import_module('.' + module_name, __package__)
+        except ImportError:
+            pass
+    return importlib.import_module(module_name)
+
+
+PARTNERS = {}
+
+
+def register_partner(adapter):
+    """
+    Adds a PartnerAdapter to the registry, replacing any with the same name.
+    """
+    PARTNERS[adapter.name] = adapter
+    return adapter
+
+
+def get_partner(partner_name):
+    try:
+        return PARTNERS[partner_name]
+    except KeyError:
+        raise ValueError('Unknown partner {!r}; registered partners are {}'.format(
+            partner_name, sorted(PARTNERS)))
+
+
+register_partner(PartnerAdapter('cabarrus', 'cabarrus',
+                                rename_function='make_rename_col_dict',
+                                cohort_function='get_students_enrolled_in_grade_and_did_not_transfer_out'))
@@ -0,0 +1,87 @@
+import os
+import sys
+
+# matplotlib is only imported the first time something is drawn, so code that
+# just computes diagnostics never loads it.
+
+
+def get_pyplot(headless=False):
+    """
+    Returns matplotlib.pyplot, importing it on first use. headless selects the
+    Agg backend, which renders to files and needs no display.
+    """
+    import matplotlib
+    if headless and 'matplotlib.pyplot' not in sys.modules:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def draw_roc_curve(plt, roc, clf_name, **kwargs):
+    plt.plot(roc['fpr'], roc['tpr'], label='ROC curve (area = %0.3f)' % roc['auc'], **kwargs)
+    plt.plot([0, 1], [0, 1], 'k--')  # random predictions curve
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.0])
+    plt.xlabel('False Positive Rate or (1 - Specificity)')
+    plt.ylabel('True Positive Rate')
+    plt.title('ROC Curve - {}'.format(clf_name))
+    plt.legend(loc="best")
+
+
+def draw_precision_recall_curve(plt, pr, clf_name, **kwargs):
+    plt.plot(pr['recall'], pr['precision'],
+             label='Precision-Recall Curve (area = {:.2f})'.format(pr['auc']), **kwargs)
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.0])
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.title('Recall-Precision Curve - {}'.format(clf_name))
+    plt.legend(loc='best')
+
+
+def draw_calibration_curve(plt, calibration, clf_name, **kwargs):
+    plt.plot(calibration['mean_predicted'], calibration['observed'], marker='o', **kwargs)
+    plt.plot([0, 1], [0, 1], 'k--')  # perfectly calibrated
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.0])
+    plt.xlabel('Predicted Probs')
+    plt.ylabel('Actual Proportions')
+    plt.title('Calibration Curve - {}'.format(clf_name))
+
+
+_DRAWERS = [('roc', draw_roc_curve),
+            ('pr', draw_precision_recall_curve),
+            ('calibration', draw_calibration_curve)]
+
+
+def render_diagnostics(curves, clf_name, output_dir, fmt='png'):
+    """
+    Writes one figure per curve computed by workflow_metrics.compute_diagnostics
+    to output_dir, named '<clf_name>_<curve>.<fmt>', without needing a display.
+    Returns the paths written.
+    """
+    plt = get_pyplot(headless=True)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    paths = []
+    for name, draw in _DRAWERS:
+        if name not in curves:
+            continue
+        fig = plt.figure()
+        draw(plt, curves[name], clf_name)
+        path = os.path.join(output_dir, '{}_{}.{}'.format(clf_name, name, fmt))
+        fig.savefig(path)
+        plt.close(fig)  # don't accumulate open figures over a batch
+        paths.append(path)
+    return paths
+
+
+def render_batch(diagnostics, output_dir, fmt='png'):
+    """
+    Renders the curves of many models. diagnostics is a list of
+    (clf_name, curves) pairs. Returns all the paths written.
+    """
+    paths = []
+    for clf_name, curves in diagnostics:
+        paths.extend(render_diagnostics(curves, clf_name, output_dir, fmt))
+    return paths
@@ -1,22 +1,22 @@
-import cabarrus
 import numpy as np
+from workflow_imputation import EmpiricalImputer
+from workflow_imputation import Imputer
+from workflow_partners import get_partner
 
 def empirical_imputation(s, seed = None):
     """
     Given a Series object containing nans, returns a Series object
     where each of the nan rows has been replaced with a random draw
     from all possible non-nan values.
+    To impute several columns, or a test set from training data, use
+    workflow_imputation.EmpiricalImputer directly.
     """
 
-    np.random.seed(seed)
-    s_replaced = s.copy()
-    empirical_distribution = s_replaced.dropna().apply(lambda v: v[0] if not(v, np.float64)
-                                              else v).values # some values are packed as a list
+    frame = s.to_frame(name='values')
+    imputed = EmpiricalImputer(seed=seed).fit_transform(frame, ['values'], copy=False)['values']
+    imputed.name = s.name
 
-    sample = np.random.choice(a=empirical_distribution, size=s_replaced.isnull().sum(), replace=True)
-    s_replaced[s_replaced.isnull()] = sample
-
-    return s_replaced
+    return imputed
 
 
 def preprocess_data(raw_data, partner_name, cohort_graduating_year, earliest_grade, model_grade,
@@ -33,12 +33,7 @@ def preprocess_data(raw_data, partner_name, cohort_graduating_year, earliest_gra
     """
     renamed_data = rename_cols_to_schema(raw_data, partner_name, cohort_graduating_year,
                                             earliest_grade)
-    if partner_name == 'cabarrus':
-        data = cabarrus.get_students_enrolled_in_grade_and_did_not_transfer_out(renamed_data, model_grade)
-
-    if partner_name == 'mcps':
-        #TODO
-        pass
+    data = get_partner(partner_name).select_cohort(renamed_data, model_grade)
 
     if impute:
         imputed_data = impute_data(data, empirical_imputation_variables, mean_imputation_variables,
@@ -53,23 +48,18 @@ def impute_data(data, empirical_imputation_variables=[],
 	            mean_imputation_variables=[],
 		        median_imputation_variables=[],
                 mode_imputation_variables=[],
-                seed=None):
-    # Creating a copy so as to not modify input dataframe
-    imputed_data = data.copy(deep=True)
-
-    for col in empirical_imputation_variables:
-        imputed_data[col] = empirical_imputation(imputed_data[col], seed=seed)
-
-    for col in mean_imputation_variables:
-        imputed_data[col].fillna(imputed_data[col].mean(), inplace=True)
-
-    for col in median_imputation_variables:
-        imputed_data[col].fillna(imputed_data[col].median(), inplace=True)
-
-    for col in mode_imputation_variables:
-        imputed_data[col].fillna(imputed_data[col].mode().iloc[0], inplace=True)
-
-    return imputed_data
+                seed=None, inplace=False):
+    """
+    Fills missing values by the strategy each column is listed under. Unless
+    inplace is True, a copy is imputed and the input dataframe is left as is.
+    To reuse the fitted statistics on other data, use workflow_imputation.Imputer.
+    """
+    imputer = Imputer(empirical_columns=empirical_imputation_variables,
+                      mean_columns=mean_imputation_variables,
+                      median_columns=median_imputation_variables,
+                      mode_columns=mode_imputation_variables,
+                      seed=seed)
+    return imputer.fit_transform(data, inplace=inplace)
 
 
 def rename_cols_to_schema(dataframe, partner_name, cohort_graduating_year, earliest_grade):
@@ -88,7 +78,7 @@ def rename_cols_to_schema(dataframe, partner_name, cohort_graduating_year, earli
 	DataFrame to be renamed. NOTE: This should be a dataframe with data only for one cohort.
     partner_name: str
 	The name of the district we're using interally to refer to the partner e.g., 'cabarrus'
-	Used to figure out which is the appropriate function to call for renaming columns
+	Used to look up the partner's adapter in workflow_partners
     cohort_graduating_year: int
 	The expected graduating year of the cohort e.g., 2014
     earliest_grade : int
@@ -96,11 +86,8 @@ def rename_cols_to_schema(dataframe, partner_name, cohort_graduating_year, earli
     """
 
     # http://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.rename.html
-    if partner_name == 'cabarrus':
-        dict_mapping = cabarrus.make_rename_col_dict(column_names=dataframe.columns,
-                                cohort_graduating_year=cohort_graduating_year,
-                                earliest_grade=earliest_grade)
-    elif partner_name == 'mcps':
-        # generate appropriate renaming dict
-       dict_mapping = {}
+    # Partners are registered in workflow_partners; their rename maps are
+    # compiled once per cohort and reused.
+    rename_map = get_partner(partner_name).rename_map(cohort_graduating_year, earliest_grade)
+    dict_mapping = rename_map.mapping(dataframe.columns)
     return dataframe.rename(columns=dict_mapping, inplace=False)
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class RankedOutcomes(object):
+    """
+    Test outcomes sorted once by descending predicted probability, with a
+    running count of positives. Precision at any top K or top P% is then a
+    single lookup, however many cutoffs are asked for.
+
+    Parameters
+    ----------
+    y_test : array
+        true labels, 1 for the positive class
+    predicted_probs : array
+        predicted probabilities of class 1
+    """
+
+    def __init__(self, y_test, predicted_probs):
+        # stable sort, so tied students keep their original order
+        order = np.argsort(-np.asarray(predicted_probs, dtype=np.float64), kind='mergesort')
+        self.n = len(order)
+        self.cum_positives = np.cumsum(np.asarray(y_test)[order] == 1)
+
+    def precision_at_k(self, top_n):
+        """
+        Returns an array with the % of positives among the top k students for
+        each k in top_n. k larger than the test set is capped at its size; k of
+        0 gives NaN. A top k with no positives gives 0.
+        """
+        k = np.minimum(np.asarray(top_n, dtype=np.int64), self.n)
+        precision = np.full(k.shape, np.nan)
+        nonzero = k > 0
+        precision[nonzero] = self.cum_positives[k[nonzero] - 1] / k[nonzero].astype(np.float64)
+        return np.round(precision * 100, 2)
+
+    def precision_at_percent(self, top_p):
+        """
+        Returns an array with the % of positives among the top p% of students
+        for each p in top_p (given as 0-100). The number of students is rounded down.
+        """
+        k = np.floor(np.asarray(top_p, dtype=np.float64) / 100.0 * self.n).astype(np.int64)
+        return self.precision_at_k(k)
+
+
+def precision_at_cutoffs(y_test, predicted_probs, top_n=[], top_p=[]):
+    """
+    Returns
+    ----------
+    (TopX_n, TopX_p) : lists with the % of positives in the top n students for
+    each n in top_n, and in the top p% for each p in top_p
+
+    Parameters
+    ----------
+    y_test : array
+        true labels
+    predicted_probs : array
+        predicted probabilities of class 1
+    top_n : list of ints
+    top_p : list of percentages, either 0-100 or, if all are between 0 and 1, fractions
+    """
+    if len(top_p) > 0 and all([0 < p < 1 for p in top_p]):  # fractions, change to percentages
+        top_p = [p * 100 for p in top_p]
+    ranked = RankedOutcomes(y_test, predicted_probs)
+    return list(ranked.precision_at_k(top_n)), list(ranked.precision_at_percent(top_p))
@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+
+RESULTS_PATH = '../results/results.db'
+
+# Diagnostics that get their own indexed column, so ranking by them doesn't
+# need to decode every stored row. Everything else lives in the JSON blob.
+METRIC_COLUMNS = {'PR AUC': 'pr_auc', 'ROC AUC': 'roc_auc'}
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS results (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           timestamp TEXT,
+           outcome TEXT,
+           model_name TEXT,
+           pr_auc REAL,
+           roc_auc REAL,
+           diagnostics TEXT NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS results_outcome_pr_auc ON results (outcome, pr_auc)",
+    "CREATE INDEX IF NOT EXISTS results_outcome_roc_auc ON results (outcome, roc_auc)",
+]
+
+
+def _to_json(value):
+    # numpy scalars and arrays from the diagnostics aren't JSON serializable
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def _metric_value(value):
+    if value is None or pd.isnull(value):
+        return None
+    return float(value)
+
+
+class ResultsStore(object):
+    """
+    Append-only store of model diagnostics in a SQLite file.
+
+    Each append is a single INSERT in its own transaction, so its cost doesn't
+    grow with the number of stored runs. SQLite's file locking serializes
+    concurrent writers (separate processes, or machines sharing a local disk).
+    WAL mode lets readers query while a run is being written.
+
+    Parameters
+    ----------
+    path : str
+        ex. '../results/results.db'
+    timeout : float
+        seconds a writer waits for another writer's lock before failing
+    """
+
+    def __init__(self, path=RESULTS_PATH, timeout=60.0):
+        self.path = path
+        self.timeout = timeout
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # a connection per call, so a store can be shared with forked workers
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def append(self, diagnostics_dict):
+        """
+        Stores one run, ex. the dict returned by get_diagnostics_dict.
+        Returns the id of the stored row.
+        """
+        return self.extend([diagnostics_dict])[0]
+
+    def extend(self, diagnostics_dicts):
+        """
+        Stores many runs in one transaction. Returns the ids of the stored rows.
+        """
+        rows = [(d.get('timestamp'), d.get('outcome'), d.get('model name'),
+                 _metric_value(d.get('PR AUC')), _metric_value(d.get('ROC AUC')),
+                 json.dumps(d, default=_to_json))
+                for d in diagnostics_dicts]
+        conn = self._connect()
+        try:
+            ids = []
+            with conn:
+                for row in rows:
+                    cursor = conn.execute('INSERT INTO results (timestamp, outcome, model_name, '
+                                          'pr_auc, roc_auc, diagnostics) VALUES (?, ?, ?, ?, ?, ?)',
+                                          row)
+                    ids.append(cursor.lastrowid)
+            return ids
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        records = []
+        for row_id, diagnostics in rows:
+            record = json.loads(diagnostics)
+            record['id'] = row_id
+            records.append(record)
+        return pd.DataFrame(records)
+
+    def top_models(self, outcome, metric='PR AUC', n=20):
+        """
+        Returns
+        ----------
+        pd.DataFrame with the n runs for outcome with the highest metric,
+        best first, read off the (outcome, metric) index
+
+        Parameters
+        ----------
+        outcome : str
+        metric : str
+            one of METRIC_COLUMNS, ex. 'PR AUC' or 'ROC AUC'
+        n : int
+        """
+        if metric not in METRIC_COLUMNS:
+            raise ValueError('metric must be one of {}, got {!r}'.format(sorted(METRIC_COLUMNS), metric))
+        column = METRIC_COLUMNS[metric]
+        return self._query('SELECT id, diagnostics FROM results '
+                           'WHERE outcome = ? AND {0} IS NOT NULL '
+                           'ORDER BY {0} DESC LIMIT ?'.format(column), (outcome, n))
+
+    def to_frame(self, outcome=None):
+        """
+        Returns every stored run (or every run for outcome) as a DataFrame,
+        in the order they were stored.
+        """
+        if outcome is None:
+            return self._query('SELECT id, diagnostics FROM results ORDER BY id')
+        return self._query('SELECT id, diagnostics FROM results WHERE outcome = ? ORDER BY id',
+                           (outcome,))
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        finally:
+            conn.close()
+
+    def import_csv(self, csv_path):
+        """
+        Appends the rows of an old results.csv. Returns the number of rows imported.
+        """
+        old_results = pd.read_csv(csv_path)
+        records = [dict((key, value) for key, value in record.items() if not pd.isnull(value))
+                   for record in old_results.to_dict(orient='records')]
+        return len(self.extend(records))
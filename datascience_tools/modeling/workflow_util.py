@@ -1,6 +1,8 @@
-import sys
-import boto
 import os
+from ..etl.s3 import COMPRESSION_EXTENSIONS
+from ..etl.s3 import get_uploader
+from ..etl.s3 import upload_dataframe
+from ..etl.s3 import upload_pickle
 
 BUCKET_NAME = "<<BUCKET>>"
 
@@ -8,7 +10,8 @@ def upload_to_s3(local_filepath, file_name, s3_path, bucket_name=BUCKET_NAME):
 	"""
 	Returns
 	----------
-	Uploads local file to appropriate s3 key, and prints status
+	Uploads local file to appropriate s3 key over a shared, pooled
+	connection, and prints throughput
 
 	Parameters
 	----------
@@ -22,46 +25,63 @@ def upload_to_s3(local_filepath, file_name, s3_path, bucket_name=BUCKET_NAME):
 	    ex. 'NC-Cabarrus/cleaned_data'
 	"""
 
-	def percent_cb(complete, total):
-	    """
-	    Helper function that prints progress
-	    """
-	    sys.stdout.write('.')
-	    sys.stdout.flush()
-
-	conn = boto.connect_s3()
-	bucket = conn.get_bucket(bucket_name)
-	full_key_name = os.path.join(s3_path, file_name)
-	k = bucket.new_key(full_key_name)
-	full_filepath = os.path.join(local_filepath, file_name)
-	k.set_contents_from_filename(full_filepath, cb=percent_cb, num_cb=10)
+	uploader = get_uploader(bucket_name)
+	result = uploader.upload_file(os.path.join(local_filepath, file_name),
+	                              os.path.join(s3_path, file_name))
+	print str(result)
 
 	return None
 
 
-def df_to_S3(df, local_filepath, file_name, s3_path, bucket_name=BUCKET_NAME):
-	#NOTE: Not used due to csv living locally in results
+def df_to_S3(df, local_filepath, file_name, s3_path, bucket_name=BUCKET_NAME, compression=None):
         """
         Returns
         ----------
-        Uploads a df to s3 as a CSV file.
+        Uploads a df to s3 as a CSV file. The csv is serialized in memory and
+        never written to local disk.
 
         Parameters
         ----------
         df : pd.DataFrame
-	local_filepath : str
-	    A folder where the csv can be stored locally. It may be deleted afterwards.
+        local_filepath : str
+            unused, kept so existing calls keep working
         file_name: str
             ex: 'stars.csv'
         bucket_name: str
         s3_path : full path for upload
             ex: '/test/'
+        compression : str
+            None, 'gzip' or 'zstd'. Adds '.gz' or '.zst' to the key name.
         """
-        full_filepath = os.path.join(local_filepath, file_name)
-        df.to_csv(full_filepath, index=False)
+        key_name = os.path.join(s3_path, file_name) + COMPRESSION_EXTENSIONS[compression]
         print "Uploading {} to S3".format(file_name)
-        upload_to_s3(local_filepath, file_name, bucket_name, s3_path)
-        print "Complete"
-	print "File is at: s3://{}/{} \n".format(bucket_name, s3_path)
+        result = upload_dataframe(df, key_name, bucket_name, compression=compression)
+        print str(result)
+        print "File is at: s3://{}/{} \n".format(bucket_name, key_name)
+
+        return None
+
+
+def pickle_to_s3(obj, file_name, s3_path, bucket_name=BUCKET_NAME, compression=None):
+        """
+        Returns
+        ----------
+        Pickles obj (e.g. a fitted model) in memory and uploads it to s3,
+        without writing a local file.
+
+        Parameters
+        ----------
+        obj : object
+        file_name: str
+            ex: 'model.pkl'
+        s3_path : full path for upload
+            ex: '/test/'
+        bucket_name: str
+        compression : str
+            None, 'gzip' or 'zstd'. Adds '.gz' or '.zst' to the key name.
+        """
+        key_name = os.path.join(s3_path, file_name) + COMPRESSION_EXTENSIONS[compression]
+        result = upload_pickle(obj, key_name, bucket_name, compression=compression)
+        print str(result)
 
         return None
@@ -0,0 +1,49 @@
+import numpy as np
+from sklearn.metrics import auc
+from sklearn.metrics import precision_recall_curve
+from sklearn.metrics import roc_auc_score
+from datascience_tools.modeling.random_util import make_rng
+from datascience_tools.modeling.workflow_bootstrap import _resample_metrics
+from datascience_tools.modeling.workflow_bootstrap import bootstrap_diagnostics
+from datascience_tools.modeling.workflow_ranking import precision_at_cutoffs
+
+TOP_N = [5, 20, 60]
+TOP_P = [10, 50]
+
+
+def test_resample_metrics_match_sklearn_and_precision_at_cutoffs():
+    rng = np.random.RandomState(0)
+    n = 60
+    y_test = rng.randint(0, 2, n)
+    # rounded, so there are tied scores
+    predicted_probs = np.round(np.clip(0.3 * y_test + rng.rand(n) * 0.7, 0, 1), 1)
+
+    order = np.argsort(-predicted_probs, kind='mergesort')
+    sorted_probs = predicted_probs[order]
+    y_sorted = (y_test[order] == 1).astype(np.float64)
+    last_of_ties = np.r_[np.flatnonzero(np.diff(sorted_probs)), n - 1]
+    draws = make_rng(1).choice(n, size=(20, n))
+    weights = np.array([np.bincount(row, minlength=n) for row in draws], dtype=np.float64)
+
+    metrics = _resample_metrics(weights, y_sorted, last_of_ties, TOP_N, TOP_P)
+    for i, row in enumerate(weights):
+        # the resample itself, in the order the scores were sorted
+        rows = np.repeat(np.arange(n), row.astype(np.int64))
+        y, probs = y_sorted[rows], sorted_probs[rows]
+        precision, recall, _ = precision_recall_curve(y, probs)
+        assert np.isclose(metrics['ROC AUC'][i], roc_auc_score(y, probs))
+        assert np.isclose(metrics['PR AUC'][i], auc(recall, precision))
+        top_x, top_p = precision_at_cutoffs(y, probs, TOP_N, TOP_P)
+        assert np.allclose([m[i] for m in metrics['% outcome on top x students']], top_x, atol=0.005)
+        assert np.allclose([m[i] for m in metrics['% outcome on top p% students']], top_p, atol=0.005)
+
+
+def test_bootstrap_intervals_do_not_depend_on_n_jobs():
+    rng = np.random.RandomState(2)
+    y_test = rng.randint(0, 2, 200)
+    predicted_probs = 0.3 * y_test + rng.rand(200) * 0.7
+    kwargs = dict(n_resamples=50, top_n=TOP_N, top_p=TOP_P, seed=3, batch_size=7)
+    single = bootstrap_diagnostics(y_test, predicted_probs, n_jobs=1, **kwargs)
+    pooled = bootstrap_diagnostics(y_test, predicted_probs, n_jobs=2, **kwargs)
+    assert single == pooled
+    assert single['ROC AUC'][0] < single['ROC AUC'][1]
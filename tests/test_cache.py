@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datascience_tools.clean.clean import CleaningJob
+from datascience_tools.clean.clean import run_cleaning_job
+from datascience_tools.etl.cache import FrameCache
+from datascience_tools.etl.cache import code_digest
+
+pytest.importorskip('pyarrow')
+
+FORMATS = ['parquet', 'feather']
+
+# how many times each cleaning routine below ran
+calls = {'double_score': 0, 'triple_score': 0}
+
+
+def double_score(df):
+    calls['double_score'] += 1
+    df['score'] = df['score'] * 2
+    return df
+
+
+def triple_score(df):
+    calls['triple_score'] += 1
+    df['score'] = df['score'] * 3
+    return df
+
+
+def frame(index):
+    return pd.DataFrame({'score': np.arange(len(index), dtype=np.float64),
+                         'name': ['a', 'b', 'c', 'd'][:len(index)]},
+                        index=index, columns=['score', 'name'])
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('index', [
+    pd.RangeIndex(4),
+    pd.Index([10, 20, 30, 40]),
+    pd.Index(['w', 'x', 'y', 'z'], name='student'),
+    pd.MultiIndex.from_tuples([(1, 2010), (1, 2011), (2, 2010), (2, 2011)],
+                              names=['student', 'year']),
+])
+def test_round_trip_keeps_index(tmpdir, fmt, index):
+    cache = FrameCache(str(tmpdir), fmt)
+    df = frame(index)
+    key = cache.key('frame', fmt)
+    assert key not in cache
+    cache.save(key, df)
+    assert key in cache
+    pd.testing.assert_frame_equal(cache.load(key), df)
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_get_or_compute_only_computes_once(tmpdir, fmt):
+    cache = FrameCache(str(tmpdir), fmt)
+    computed = []
+
+    def compute():
+        computed.append(1)
+        return frame(pd.RangeIndex(3))
+
+    first = cache.get_or_compute('key', compute)
+    second = cache.get_or_compute('key', compute)
+    assert len(computed) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_code_digest_follows_code():
+    assert code_digest(double_score) == code_digest(double_score)
+    assert code_digest(double_score) != code_digest(triple_score)
+
+
+def write_raw(tmpdir, scores):
+    raw_dir = tmpdir.ensure('raw', dir=True)
+    pd.DataFrame({'score': scores}).to_csv(str(raw_dir.join('scores.csv')), index=False)
+    return str(raw_dir)
+
+
+def clean_job(routine):
+    return CleaningJob(name='scores', raw_filename='scores.csv', clean_filename='scores_clean.csv',
+                       read_func=pd.read_csv, cleaning_routines=[routine])
+
+
+def run(job, raw_dir, tmpdir):
+    clean_dir = tmpdir.ensure('clean', dir=True)
+    name, seconds, error = run_cleaning_job(job, raw_dir, str(clean_dir), upload=False,
+                                            cache_dir=str(tmpdir.join('cache')))
+    assert error is None, error
+    return list(pd.read_csv(str(clean_dir.join('scores_clean.csv')))['score'])
+
+
+def test_cleaning_job_is_cached(tmpdir):
+    raw_dir = write_raw(tmpdir, [1, 2, 3])
+    job = clean_job(double_score)
+    before = calls['double_score']
+    assert run(job, raw_dir, tmpdir) == [2, 4, 6]
+    assert run(job, raw_dir, tmpdir) == [2, 4, 6]
+    assert calls['double_score'] == before + 1
+
+    # a deleted cleaned file is written again from the cache
+    tmpdir.join('clean', 'scores_clean.csv').remove()
+    assert run(job, raw_dir, tmpdir) == [2, 4, 6]
+    assert calls['double_score'] == before + 1
+
+
+def test_cleaning_job_reruns_when_raw_file_changes(tmpdir):
+    job = clean_job(double_score)
+    before = calls['double_score']
+    assert run(job, write_raw(tmpdir, [1, 2, 3]), tmpdir) == [2, 4, 6]
+    assert run(job, write_raw(tmpdir, [5, 6]), tmpdir) == [10, 12]
+    assert calls['double_score'] == before + 2
+
+
+def test_cleaning_job_reruns_when_code_changes(tmpdir):
+    raw_dir = write_raw(tmpdir, [1, 2, 3])
+    before = calls['triple_score']
+    assert run(clean_job(double_score), raw_dir, tmpdir) == [2, 4, 6]
+    assert run(clean_job(triple_score), raw_dir, tmpdir) == [3, 6, 9]
+    assert calls['triple_score'] == before + 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from datascience_tools.modeling import workflow_diagnostics
+
+
+class FakePyplot(object):
+    """Records the pyplot calls made on it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(name)
+
+
+def data():
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(rng.rand(200, 3), columns=['a', 'b', 'c'])
+    df['outcome'] = (df['a'] + 0.3 * rng.rand(200) > 0.6).astype(int)
+    return df
+
+
+def diagnostics(clf, monkeypatch, **kwargs):
+    plt = FakePyplot()
+    monkeypatch.setattr(workflow_diagnostics, 'get_pyplot', lambda: plt)
+    df = data()
+    clf.fit(df[['a', 'b', 'c']].values, df['outcome'].values)
+    results = workflow_diagnostics.get_diagnostics_dict(
+        clf, df, ['a', 'b', 'c'], 'outcome', 'clf', get_pr=False, get_roc=False,
+        get_precision_at_top_x=False, **kwargs)
+    return results, plt
+
+
+def test_forest_importances_are_printed_and_plotted(monkeypatch, capsys):
+    results, plt = diagnostics(RandomForestClassifier(n_estimators=5, random_state=0),
+                               monkeypatch)
+    assert results['ranked features'].startswith('1. a - ')
+    assert 'Feature Importances:' in capsys.readouterr().out
+    assert 'bar' in plt.calls and 'show' in plt.calls
+
+
+def test_plot_importances_off(monkeypatch, capsys):
+    results, plt = diagnostics(RandomForestClassifier(n_estimators=5, random_state=0),
+                               monkeypatch, plot_importances=False)
+    assert 'ranked features' in results
+    assert 'Feature Importances:' in capsys.readouterr().out
+    assert plt.calls == []
+
+
+def test_skipped_importances_are_reported(monkeypatch, capsys):
+    results, plt = diagnostics(LogisticRegression(solver='lbfgs'), monkeypatch)
+    assert 'ranked features' not in results
+    out = capsys.readouterr().out
+    assert 'Skipping feature importances for clf: LogisticRegression has no estimators_' in out
+    assert plt.calls == []
@@ -0,0 +1,18 @@
+import pandas as pd
+from datascience_tools.etl.util import merge_demographic_attendence
+
+
+def test_repeated_student_collapses_without_joining_strings():
+    demog_attend_df = pd.DataFrame({'External_Student_ID': [1, 1, 2],
+                                    'reporting_year': [2010, 2010, 2010],
+                                    'sex': ['F', 'F', 'M'],
+                                    'school': ['A', 'B', 'C'],
+                                    'days_absent': [3, 4, 5]},
+                                   columns=['External_Student_ID', 'reporting_year', 'sex',
+                                            'school', 'days_absent'])
+    cohort_df = pd.DataFrame({'External_Student_ID': [1, 2]})
+    merged, flagged_ids = merge_demographic_attendence(cohort_df, demog_attend_df)
+    assert flagged_ids == set([1])
+    assert list(merged['school_2010'].astype(str)) == ['A', 'C']
+    assert list(merged['sex_2010'].astype(str)) == ['F', 'M']
+    assert list(merged['days_absent_2010']) == [7, 5]
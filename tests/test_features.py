@@ -0,0 +1,52 @@
+import weakref
+import numpy as np
+import pandas as pd
+from datascience_tools.modeling.workflow_features import FeatureMatrixCache
+
+
+def split(seed):
+    rng = np.random.RandomState(seed)
+    columns = ['a', 'b', 'c']
+    return (pd.DataFrame(rng.rand(20, 3), columns=columns),
+            pd.DataFrame(rng.rand(10, 3), columns=columns))
+
+
+def test_same_frames_reuse_matrices():
+    cache = FeatureMatrixCache()
+    training, testing = split(0)
+    first = cache.get(training, testing, ['a', 'b'])
+    assert cache.get(training, testing, ['a', 'b']) is first
+    assert not first.X_train.flags.writeable
+    assert cache.get(training, testing, ['b', 'a']) is not first
+    assert len(cache) == 2
+
+
+def test_least_recently_used_entry_is_dropped_with_its_frames():
+    cache = FeatureMatrixCache(max_entries=2)
+    training, testing = split(0)
+    kept = cache.get(training, testing, ['a'])
+    cache.get(training, testing, ['b'])
+    cache.get(training, testing, ['a'])  # 'a' is now more recently used than 'b'
+    cache.get(training, testing, ['c'])
+    assert len(cache) == 2
+    assert cache.get(training, testing, ['a']) is kept
+
+    other_training, other_testing = split(1)
+    ref = weakref.ref(other_training)
+    cache.get(other_training, other_testing, ['a'])
+    del other_training, other_testing
+    assert ref() is not None
+    cache.get(training, testing, ['b'])
+    cache.get(training, testing, ['c'])
+    assert ref() is None
+
+
+def test_dataset_id_keys_reloaded_frames_without_holding_them():
+    cache = FeatureMatrixCache(max_entries=None)
+    training, testing = split(0)
+    ref = weakref.ref(training)
+    first = cache.get(training, testing, ['a', 'c'], dataset_id='cohort')
+    reloaded = cache.get(training.copy(), testing.copy(), ['a', 'c'], dataset_id='cohort')
+    assert reloaded is first
+    del training
+    assert ref() is None
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from datascience_tools.etl.dtypes import optimize_dtypes
+from datascience_tools.etl.util import merge_demographic_attendence
+from datascience_tools.modeling.workflow_preprocessing import impute_data
+from datascience_tools.modeling.workflow_imputation import Imputer
+from datascience_tools.modeling.workflow_imputation import column_modes
+
+
+def demographics_frame():
+    return pd.DataFrame({'sex_2010': ['M', 'F', None, 'F', 'F', None],
+                         'ethnic_2010': ['W', None, 'B', 'B', 'H', 'B'],
+                         'swd_2010': [1.0, 0.0, np.nan, 0.0, 0.0, 1.0],
+                         'retained_2010': [1.0, 0.0, np.nan, 0.0, 0.0, 1.0],
+                         'gpa_2010': [3.5, np.nan, 2.0, 2.5, np.nan, 3.0]})
+
+
+def test_impute_optimized_frame():
+    optimized = optimize_dtypes(demographics_frame(), verbose=False)
+    assert str(optimized['sex_2010'].dtype) == 'category'
+    assert str(optimized['swd_2010'].dtype) == 'category'
+    assert str(optimized['retained_2010'].dtype) == 'Int8'
+
+    imputer = Imputer(mode_columns=['sex_2010', 'ethnic_2010', 'swd_2010', 'retained_2010'],
+                      mean_columns=['gpa_2010']).fit(optimized)
+    imputed = imputer.transform(optimized)
+
+    assert imputed.notnull().all().all()
+    assert optimized['sex_2010'].isnull().sum() == 2  # the input is left as is
+    assert list(imputed['sex_2010']) == ['M', 'F', 'F', 'F', 'F', 'F']
+    assert list(imputed['ethnic_2010'].astype(str)) == ['W', 'B', 'B', 'B', 'H', 'B']
+    assert list(imputed['swd_2010'].astype(float)) == [1, 0, 0, 0, 0, 1]
+    assert list(imputed['retained_2010'].astype(int)) == [1, 0, 0, 0, 0, 1]
+    assert np.allclose(imputed['gpa_2010'], [3.5, 2.75, 2.0, 2.5, 2.75, 3.0])
+
+
+def test_column_modes_of_categoricals_and_nullable_ints():
+    modes = column_modes(optimize_dtypes(demographics_frame(), verbose=False))
+    assert modes['sex_2010'] == 'F'
+    assert modes['ethnic_2010'] == 'B'
+    assert modes['swd_2010'] == 0
+    assert modes['retained_2010'] == 0
+
+
+def assert_same_values(left, right):
+    assert list(left.columns) == list(right.columns)
+    for col in left.columns:
+        a = np.asarray(left[col], dtype=object)
+        b = np.asarray(right[col], dtype=object)
+        try:
+            a, b = a.astype(np.float64), b.astype(np.float64)
+        except ValueError:  # strings
+            assert list(a) == list(b), col
+        else:
+            assert np.allclose(a, b, rtol=1e-6, equal_nan=True), col
+
+
+def test_optimized_and_unoptimized_merges_impute_the_same():
+    rng = np.random.RandomState(0)
+    n = 500
+    demog_attend_df = pd.DataFrame({'External_Student_ID': np.arange(n),
+                                    'reporting_year': rng.choice([2010, 2011], n),
+                                    'sex': rng.choice(['M', 'F'], n),
+                                    'ethnic': rng.choice(['W', 'B', 'H'], n),
+                                    'swd': rng.choice([0, 1], n),
+                                    'retained': rng.choice([0, 1], n),
+                                    'days_absent': rng.randint(0, 100, n)})
+    cohort_df = pd.DataFrame({'External_Student_ID': np.arange(n + 20)})
+    plain, _ = merge_demographic_attendence(cohort_df, demog_attend_df, optimize=False)
+    optimized, _ = merge_demographic_attendence(cohort_df, demog_attend_df)
+    assert str(optimized['retained_2010'].dtype) == 'Int8'
+    assert_same_values(plain, optimized)
+
+    columns = dict(
+        mode_imputation_variables=['sex_2010', 'ethnic_2010', 'swd_2010', 'retained_2011'],
+        mean_imputation_variables=['days_absent_2010', 'retained_2010'],
+        median_imputation_variables=['days_absent_2011'],
+        empirical_imputation_variables=['sex_2011', 'swd_2011'])
+    imputed_plain = impute_data(plain, seed=0, **columns)
+    imputed_optimized = impute_data(optimized, seed=0, **columns)
+    assert imputed_optimized[sum(columns.values(), [])].notnull().all().all()
+    assert_same_values(imputed_plain, imputed_optimized)
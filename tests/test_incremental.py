@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datascience_tools.etl.incremental import IncrementalCohort
+from datascience_tools.etl.util import merge_address_history
+from datascience_tools.etl.util import merge_demographic_attendence
+from datascience_tools.etl.util import merge_yearly_gpa
+
+pytest.importorskip('pyarrow')
+
+
+def sources(years):
+    rng = np.random.RandomState(len(years))
+    n = 50
+    ids = np.tile(np.arange(n), len(years))
+    reporting_years = np.repeat(years, n)
+    return {
+        'yearly_gpa': pd.DataFrame({'External_Student_ID': ids, 'ReportingYear': reporting_years,
+                                    'SchoolYear': 'x', 'gpa': rng.rand(len(ids)) * 4}),
+        'demographic_attendance': pd.DataFrame({
+            'External_Student_ID': ids, 'reporting_year': reporting_years,
+            'sex': rng.choice(['M', 'F'], len(ids)),
+            'retained': rng.choice([0, 1], len(ids)),
+            'days_absent': rng.randint(0, 20, len(ids))}),
+        'address_history': pd.DataFrame({'External_Student_ID': ids,
+                                         'ReportingYear': reporting_years,
+                                         'zip': rng.randint(0, 99, len(ids))}),
+    }
+
+
+def full_build(cohort_df, long_dfs):
+    wide = merge_yearly_gpa(cohort_df, long_dfs['yearly_gpa'])
+    wide, _ = merge_demographic_attendence(wide, long_dfs['demographic_attendance'])
+    return merge_address_history(wide, long_dfs['address_history'])
+
+
+def test_incremental_build_matches_full_build(tmpdir):
+    # students 50-59 have no records, so the flags get missing values
+    cohort_df = pd.DataFrame({'External_Student_ID': np.arange(60)})
+    cohort = IncrementalCohort(str(tmpdir))
+    for years in ([2010, 2011], [2010, 2011, 2012]):
+        long_dfs = sources(years)
+        wide, _ = cohort.build(cohort_df, long_dfs, verbose=False)
+        expected = full_build(cohort_df, long_dfs)
+        pd.testing.assert_frame_equal(wide, expected)
+    assert str(wide['retained_2012'].dtype) == 'Int8'
+    assert wide['gpa_2012'].dtype == np.float64
@@ -0,0 +1,35 @@
+import io
+import numpy as np
+import pandas as pd
+from datascience_tools.etl.dtypes import optimize_dtypes
+from datascience_tools.exploration.workflow_profile import profile
+from datascience_tools.exploration.workflow_profile import profile_csv
+
+
+def test_profile_optimized_frame():
+    df = pd.DataFrame({'sex_2010': ['M', 'F', None, 'F'],
+                       'retained_2010': [1.0, 0.0, np.nan, 1.0],
+                       'gpa_2011': [1.0, 2.0, 3.0, np.nan]},
+                      columns=['sex_2010', 'retained_2010', 'gpa_2011'])
+    report = profile(optimize_dtypes(df, float32=True, verbose=False))
+    columns = report.columns
+    assert list(columns['dtype']) == ['category', 'Int8', 'float32']
+    assert list(columns['null_rate']) == [0.25, 0.25, 0.25]
+    assert list(columns['distinct']) == [2, 2, 3]
+    assert columns.at['retained_2010', 'max'] == 1
+    assert np.isnan(columns.at['sex_2010', 'max'])
+    assert report.year_coverage.at['gpa', '2011'] == 0.75
+
+
+def test_profile_csv_dtype_changes_between_chunks():
+    csv = u'a,b\n1,1\n2,1\n3,1\n4,1.0\nfoo,1.5\n1,\n'
+    columns = profile_csv(io.StringIO(csv), chunksize=3).columns
+    # 'a' turns into strings in the second chunk
+    assert columns.at['a', 'dtype'] == 'object'
+    assert columns.at['a', 'distinct'] == 5
+    assert np.isnan(columns.at['a', 'min'])
+    # 'b' is int64, then float64; 1 and 1.0 are the same value
+    assert columns.at['b', 'dtype'] == 'float64'
+    assert columns.at['b', 'distinct'] == 2
+    assert columns.at['b', 'distinct_exact']
+    assert (columns.at['b', 'min'], columns.at['b', 'max']) == (1.0, 1.5)
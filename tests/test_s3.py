@@ -0,0 +1,206 @@
+import gzip
+import io
+import os
+import pickle
+import threading
+import pandas as pd
+import pytest
+from datascience_tools.etl import s3
+
+
+class FakeKey(object):
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def set_contents_from_file(self, fp, size):
+        self.bucket.contents[self.name] = fp.read(size)
+
+
+class FakeMultipartUpload(object):
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.parts = {}
+        self.state = 'open'
+
+    def upload_part_from_file(self, fp, part_num, size):
+        if part_num == self.bucket.fail_on_part:
+            raise IOError('connection reset')
+        self.parts[part_num] = fp.read(size)
+
+    def complete_upload(self):
+        self.state = 'complete'
+        self.bucket.contents[self.name] = b''.join(self.parts[num] for num in sorted(self.parts))
+
+    def cancel_upload(self):
+        self.state = 'cancelled'
+
+
+class FakeBucket(object):
+    """
+    Keeps what is uploaded to it in contents, keyed by key name. Uploading
+    part fail_on_part of a multipart upload raises an IOError.
+    """
+
+    def __init__(self, fail_on_part=None):
+        self.contents = {}
+        self.multipart_uploads = []
+        self.fail_on_part = fail_on_part
+
+    def new_key(self, name):
+        return FakeKey(self, name)
+
+    def initiate_multipart_upload(self, name):
+        self.multipart_uploads.append(FakeMultipartUpload(self, name))
+        return self.multipart_uploads[-1]
+
+
+class FakeConnection(object):
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def get_bucket(self, bucket_name):
+        return self.bucket
+
+
+class CountingConnect(object):
+    """
+    A connect function that counts how many connections were opened.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        return FakeConnection(self.bucket)
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = FakeBucket()
+    uploader = s3.S3Uploader('test-bucket', connect=lambda: FakeConnection(bucket))
+    monkeypatch.setitem(s3._uploaders, (os.getpid(), 'test-bucket'), uploader)
+    return bucket
+
+
+def write_file(tmpdir, name, data):
+    path = tmpdir.join(name)
+    path.write_binary(data)
+    return str(path)
+
+
+def test_small_file_is_one_put_and_reuses_the_connection(tmpdir):
+    bucket = FakeBucket()
+    connect = CountingConnect(bucket)
+    uploader = s3.S3Uploader('test-bucket', connect=connect, multipart_threshold=100)
+    for i in range(3):
+        path = write_file(tmpdir, 'small{}.csv'.format(i), b'a,b\n1,2\n')
+        result = uploader.upload_file(path, 'small{}.csv'.format(i))
+        assert result.n_bytes == 8
+    assert bucket.contents['small2.csv'] == b'a,b\n1,2\n'
+    assert bucket.multipart_uploads == []
+    assert connect.calls == 1
+
+
+def test_large_file_is_uploaded_in_parts(tmpdir):
+    bucket = FakeBucket()
+    uploader = s3.S3Uploader('test-bucket', connect=CountingConnect(bucket),
+                             multipart_threshold=100, part_size=40)
+    data = bytes(bytearray(range(250)))
+    result = uploader.upload_file(write_file(tmpdir, 'big.bin', data), 'big.bin')
+    multipart, = bucket.multipart_uploads
+    assert multipart.state == 'complete'
+    assert [len(multipart.parts[num]) for num in sorted(multipart.parts)] == [40] * 6 + [10]
+    assert bucket.contents['big.bin'] == data
+    assert result.n_bytes == 250
+
+
+def test_failed_part_cancels_the_upload(tmpdir):
+    bucket = FakeBucket(fail_on_part=2)
+    uploader = s3.S3Uploader('test-bucket', connect=CountingConnect(bucket),
+                             multipart_threshold=100, part_size=40)
+    with pytest.raises(IOError):
+        uploader.upload_file(write_file(tmpdir, 'big.bin', b'x' * 250), 'big.bin')
+    assert bucket.multipart_uploads[0].state == 'cancelled'
+    assert 'big.bin' not in bucket.contents
+
+
+def test_upload_files_keeps_order_and_bounds_connections(tmpdir):
+    bucket = FakeBucket()
+    connect = CountingConnect(bucket)
+    uploader = s3.S3Uploader('test-bucket', connect=connect, max_workers=3)
+    uploads = [(write_file(tmpdir, 'f{}.csv'.format(i), b'x' * (i + 1)), 'key{}'.format(i))
+               for i in range(10)]
+    results = uploader.upload_files(uploads)
+    assert [result.key_name for result in results] == ['key{}'.format(i) for i in range(10)]
+    assert [result.n_bytes for result in results] == list(range(1, 11))
+    assert bucket.contents['key9'] == b'x' * 10
+    assert 1 <= connect.calls <= 3
+
+
+def test_upload_files_raises_when_an_upload_fails(tmpdir):
+    bucket = FakeBucket(fail_on_part=1)
+    uploader = s3.S3Uploader('test-bucket', connect=CountingConnect(bucket),
+                             max_workers=2, multipart_threshold=100, part_size=40)
+    uploads = [(write_file(tmpdir, 'small.csv', b'x' * 10), 'small'),
+               (write_file(tmpdir, 'big.bin', b'x' * 250), 'big')]
+    with pytest.raises(IOError):
+        uploader.upload_files(uploads)
+    assert [multipart.state for multipart in bucket.multipart_uploads] == ['cancelled']
+
+
+def test_report_throughput(capsys):
+    s3.report_throughput([s3.UploadResult('a.csv', 2 * s3.MB, 1.0),
+                          s3.UploadResult('b.csv', 4 * s3.MB, 2.0)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ['a.csv: 2.0 MB in 1.0s (2.0 MB/s)',
+                     'b.csv: 4.0 MB in 2.0s (2.0 MB/s)',
+                     'Total: 6.0 MB in 2.0s (3.0 MB/s)']
+
+
+def test_get_uploader_is_shared_per_process_and_bucket(monkeypatch):
+    monkeypatch.setattr(s3, '_uploaders', {})
+    uploader = s3.get_uploader('bucket-a')
+    assert s3.get_uploader('bucket-a') is uploader
+    assert s3.get_uploader('bucket-b') is not uploader
+    monkeypatch.setattr(s3.os, 'getpid', lambda: -1)  # as in a forked worker
+    assert s3.get_uploader('bucket-a') is not uploader
+
+
+def test_upload_dataframe_gzip(bucket):
+    df = pd.DataFrame({'id': [1, 2, 3], 'gpa': [3.5, 2.0, 4.0]}, columns=['id', 'gpa'])
+    result = s3.upload_dataframe(df, 'cleaned.csv.gz', 'test-bucket', compression='gzip')
+    body = bucket.contents['cleaned.csv.gz']
+    assert result.key_name == 'cleaned.csv.gz'
+    assert result.n_bytes == len(body)
+    uploaded = pd.read_csv(gzip.GzipFile(fileobj=io.BytesIO(body)))
+    pd.testing.assert_frame_equal(uploaded, df)
+
+
+def test_upload_pickle(bucket):
+    obj = {'model': 'rf', 'features': ['gpa', 'absences']}
+    result = s3.upload_pickle(obj, 'model.pkl', 'test-bucket')
+    body = bucket.contents['model.pkl']
+    assert result.n_bytes == len(body)
+    assert pickle.loads(body) == obj
+
+
+def test_upload_pickle_zstd(bucket):
+    zstandard = pytest.importorskip('zstandard')
+    obj = list(range(1000))
+    s3.upload_pickle(obj, 'numbers.pkl.zst', 'test-bucket', compression='zstd')
+    body = bucket.contents['numbers.pkl.zst']
+    assert pickle.loads(zstandard.ZstdDecompressor().decompressobj().decompress(body)) == obj
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        s3.serialize_to_buffer(lambda f: f.write(b'x'), compression='bz2')
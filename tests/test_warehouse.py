@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy
+from datascience_tools.etl import schema
+from datascience_tools.etl.warehouse import FeatureSpec
+from datascience_tools.etl.warehouse import extract_features
+from datascience_tools.etl.warehouse import feature_columns
+from datascience_tools.etl.warehouse import load_feature
+from datascience_tools.modeling.workflow_model_setup import run_model
+
+
+class RecordingClassifier(object):
+    """Keeps the matrix run_model fits on."""
+
+    def fit(self, X, y):
+        self.X = X
+        return self
+
+    def predict_proba(self, X):
+        return np.tile([0.5, 0.5], (len(X), 1))
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine('sqlite://')
+    schema.db.Model.metadata.create_all(engine)
+    gpa = pd.DataFrame({'External_Student_ID': [1, 2, 1, 2],
+                        'ReportingYear': [2010, 2010, 2011, 2011],
+                        'gpa': [3.0, 2.0, 3.5, 2.5]})
+    absences = pd.DataFrame({'External_Student_ID': [1, 2],
+                             'ReportingYear': [2010, 2010],
+                             'absence_rate': [0.1, 0.2]})
+    load_feature(engine, schema.GPA, gpa, {'gpa': 'gpa'}, year_col='ReportingYear')
+    load_feature(engine, schema.AbsenceRate, absences, {'absence_rate': 'absence_rate'},
+                 year_col='ReportingYear')
+    return engine
+
+
+def test_feature_columns_order_reaches_run_model(engine):
+    specs = [FeatureSpec(schema.GPA, ['gpa'], [2011, 2010]),
+             FeatureSpec(schema.AbsenceRate, ['absence_rate'], [2010])]
+    cohort = pd.DataFrame({'External_Student_ID': [2, 1], 'outcome': [0, 1]})
+    data = extract_features(engine, cohort, specs)
+    features = feature_columns(specs)
+    assert features == ['gpa_2011', 'gpa_2010', 'absence_rate_2010']
+    assert list(data.columns) == ['External_Student_ID', 'outcome'] + features
+
+    clf, _ = run_model(data, data, features, 'outcome', RecordingClassifier(), 'recording',
+                       normalize=False, verbose=False)
+    assert clf.X.tolist() == [[2.5, 2.0, 0.2], [3.5, 3.0, 0.1]]
+
+
+def test_failed_extract_leaves_no_temporary_table(engine):
+    cohort = pd.DataFrame({'External_Student_ID': [1, 2]})
+    with pytest.raises(KeyError):
+        extract_features(engine, cohort, [FeatureSpec(schema.GPA, ['not_a_column'], [2010])])
+    data = extract_features(engine, cohort, [FeatureSpec(schema.GPA, ['gpa'], [2010])])
+    assert list(data['gpa_2010']) == [3.0, 2.0]
+
+
+def test_string_years_match_int_years(engine):
+    spec = FeatureSpec(schema.GPA, ['gpa'], ['2011', '2010'])
+    assert spec.years == (2011, 2010)
+    cohort = pd.DataFrame({'External_Student_ID': [1, 2]})
+    data = extract_features(engine, cohort, [spec])
+    assert feature_columns([spec]) == ['gpa_2011', 'gpa_2010']
+    assert data['gpa_2011'].tolist() == [3.5, 2.5]
+    assert data['gpa_2010'].tolist() == [3.0, 2.0]